@@ -0,0 +1,81 @@
+import os
+from functools import lru_cache
+from typing import Optional
+from PIL import Image, ImageDraw, ImageFont
+import numpy as np
+
+# Caption/watermark bitmaps. Fonts are loaded once per process; caption
+# arrays for moviepy are memoized in a small LRU (only that form is cached,
+# since most caption texts occur in one video only).
+
+FONT_PATHS = [
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+    "/Library/Fonts/Arial.ttf",
+    "C:\\Windows\\Fonts\\arial.ttf",
+]
+DEFAULT_MAX_WIDTH = 1080 - 120
+CACHE_SIZE = int(os.getenv("CAPTION_CACHE_SIZE", "32"))
+
+STYLES = {
+    "caption": dict(fill=(255,255,255,255), backdrop=(0,0,0,140), radius=20, line_gap=8),
+}
+
+@lru_cache(maxsize=None)
+def get_font(size: int = 64, font_path: Optional[str] = None):
+    # Try the requested font, then common system fonts; fallback to default
+    for fp in ([font_path] if font_path else FONT_PATHS):
+        if fp and os.path.exists(fp):
+            return ImageFont.truetype(fp, size)
+    return ImageFont.load_default()
+
+def render_text_image(text: str, font_path: Optional[str] = None, size: int = 64, max_width: int = DEFAULT_MAX_WIDTH,
+                      padding: int = 24, style: str = "caption") -> Image.Image:
+    """
+    Render `text` word-wrapped on a rounded translucent backdrop.
+    """
+    font = get_font(size, font_path)
+    st = STYLES[style]
+
+    # Wrap text; each finished line keeps the bbox measured while wrapping
+    lines = []
+    line, line_bbox = "", (0, 0, 0, 0)
+    for w in text.split():
+        test = f"{line} {w}".strip()
+        bbox = font.getbbox(test)
+        if bbox[2] > max_width and line:
+            lines.append((line, line_bbox))
+            line, line_bbox = w, font.getbbox(w)
+        else:
+            line, line_bbox = test, bbox
+    if line:
+        lines.append((line, line_bbox))
+
+    max_line_w = max((b[2] for _, b in lines), default=0)
+    total_h = sum(b[3] for _, b in lines) + padding*2 + max(0, len(lines)-1)*st["line_gap"]
+    img = Image.new("RGBA", (max_line_w + padding*2, total_h), (0,0,0,0))
+    draw = ImageDraw.Draw(img)
+
+    # Draw semi-transparent rectangle backdrop
+    draw.rounded_rectangle((0,0,img.width,img.height), radius=st["radius"], fill=st["backdrop"])
+
+    y = padding
+    for ln, bbox in lines:
+        draw.text(((img.width - bbox[2])//2, y), ln, font=font, fill=st["fill"])
+        y += bbox[3] + st["line_gap"]
+
+    return img
+
+@lru_cache(maxsize=CACHE_SIZE)
+def caption_array(text: str, font_path: Optional[str] = None, size: int = 64, max_width: int = DEFAULT_MAX_WIDTH,
+                  padding: int = 24, style: str = "caption") -> np.ndarray:
+    # RGBA frame for ImageClip, handed over in memory (no PNG round-trip)
+    arr = np.asarray(render_text_image(text, font_path, size, max_width, padding, style))
+    arr.flags.writeable = False
+    return arr
+
+@lru_cache(maxsize=8)
+def watermark_array(brand_handle: str) -> np.ndarray:
+    # Same for every video, so kept outside the caption LRU
+    arr = np.asarray(render_text_image(brand_handle))
+    arr.flags.writeable = False
+    return arr
@@ -1,6 +1,7 @@
-from typing import List, Tuple
+from typing import List, Tuple, Optional
 from pathlib import Path
-import math, shutil, os
+import math, shutil, os, gc, threading
+from . import metrics
 
 def naive_segments(text: str, audio_duration: float) -> List[Tuple[str, float, float]]:
     # Split into sentences by punctuation. Allocate time proportionally by length.
@@ -20,14 +21,77 @@ def naive_segments(text: str, audio_duration: float) -> List[Tuple[str, float, f
         segs[-1] = (segs[-1][0], segs[-1][1], audio_duration)
     return segs
 
+class WhisperServer:
+    """
+    Keeps one Whisper model loaded for the life of the process instead of
+    loading it per article. The model is dropped after `idle_seconds` without
+    work and loaded again on the next request.
+    """
+
+    def __init__(self, model_name: Optional[str] = None, threads: Optional[int] = None, idle_seconds: Optional[float] = None):
+        self.model_name = model_name or os.getenv("WHISPER_MODEL","tiny")
+        self.threads = threads if threads is not None else int(os.getenv("WHISPER_THREADS","0"))
+        self.idle_seconds = idle_seconds if idle_seconds is not None else float(os.getenv("WHISPER_IDLE_SECONDS","600"))
+        self._model = None
+        self._lock = threading.Lock()
+        self._idle_timer: Optional[threading.Timer] = None
+
+    def _load(self):
+        try:
+            import whisper
+        except Exception:
+            raise RuntimeError("openai-whisper not installed. Install to enable accurate caption timing.")
+        if self.threads:
+            import torch
+            torch.set_num_threads(self.threads)
+        self._model = whisper.load_model(self.model_name)
+
+    def _arm_idle_timer(self):
+        if self.idle_seconds <= 0:
+            return
+        self._idle_timer = threading.Timer(self.idle_seconds, self.unload)
+        self._idle_timer.daemon = True
+        self._idle_timer.start()
+
+    def unload(self):
+        with self._lock:
+            self._model = None
+        gc.collect()
+
+    def transcribe_many(self, audio_paths: List[Path], word_timestamps: bool = True) -> List[dict]:
+        with self._lock:
+            if self._idle_timer:
+                self._idle_timer.cancel()
+            try:
+                with metrics.span("whisper") as sp:
+                    sp.set(files=len(audio_paths), cold=self._model is None)
+                    if self._model is None:
+                        self._load()
+                    return [self._model.transcribe(str(p), word_timestamps=word_timestamps) for p in audio_paths]
+            finally:
+                self._arm_idle_timer()
+
+_server: Optional[WhisperServer] = None
+
+def get_whisper_server() -> WhisperServer:
+    global _server
+    if _server is None:
+        _server = WhisperServer()
+    return _server
+
+def _segments(result: dict) -> List[Tuple[str, float, float]]:
+    return [(s.get("text","").strip(), float(s["start"]), float(s["end"])) for s in result.get("segments", [])]
+
+def _words(result: dict) -> List[Tuple[str, float, float]]:
+    return [(w.get("word","").strip(), float(w["start"]), float(w["end"]))
+            for s in result.get("segments", []) for w in s.get("words", [])]
+
+# Segment captions skip word-level alignment; only whisper_words pays for it
 def whisper_segments(audio_path: Path) -> List[Tuple[str, float, float]]:
-    try:
-        import whisper
-    except Exception:
-        raise RuntimeError("openai-whisper not installed. Install to enable accurate caption timing.")
-    model = whisper.load_model(os.getenv("WHISPER_MODEL","tiny"))
-    result = model.transcribe(str(audio_path))
-    segs = []
-    for s in result.get("segments", []):
-        segs.append((s.get("text","").strip(), float(s["start"]), float(s["end"])))
-    return segs
+    return _segments(get_whisper_server().transcribe_many([audio_path], word_timestamps=False)[0])
+
+def whisper_segments_batch(audio_paths: List[Path]) -> List[List[Tuple[str, float, float]]]:
+    return [_segments(r) for r in get_whisper_server().transcribe_many(audio_paths, word_timestamps=False)]
+
+def whisper_words(audio_path: Path) -> List[Tuple[str, float, float]]:
+    return _words(get_whisper_server().transcribe_many([audio_path], word_timestamps=True)[0])
@@ -1,52 +1,201 @@
-import sqlite3
+import os, sqlite3, threading
+from collections import OrderedDict
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Iterable, List, Optional, Tuple
 
-DB_PATH = Path("secrets/shorts_factory.sqlite")
+DB_PATH = Path(os.getenv("DB_PATH", "secrets/shorts_factory.sqlite"))
+# WAL needs shared memory between the processes using the file, so it only
+# works when every process is on the same host. For a database on a shared
+# filesystem set DB_JOURNAL_MODE=DELETE (the filesystem must support POSIX locks).
+DB_JOURNAL_MODE = os.getenv("DB_JOURNAL_MODE", "WAL")
+
+_conn: Optional[sqlite3.Connection] = None
+_lock = threading.RLock()
+
+# Front cache of recently seen (source, external_id) keys, checked before SQLite
+SEEN_CACHE_SIZE = int(os.getenv("SEEN_CACHE_SIZE", "10000"))
+_seen_cache: "OrderedDict[Tuple[str, str], None]" = OrderedDict()
+
+def get_conn() -> sqlite3.Connection:
+    """
+    One long-lived connection per process (WAL by default, so readers never
+    block the writer). sqlite3 keeps the prepared statements in its statement cache.
+    """
+    global _conn
+    with _lock:
+        if _conn is None:
+            _conn = sqlite3.connect(DB_PATH, check_same_thread=False, cached_statements=256)
+            _conn.execute(f"PRAGMA journal_mode={DB_JOURNAL_MODE}")
+            _conn.execute("PRAGMA synchronous=NORMAL")
+            _conn.execute("PRAGMA busy_timeout=5000")
+        return _conn
+
+def close_db():
+    global _conn
+    with _lock:
+        if _conn is not None:
+            _conn.close()
+            _conn = None
+        _seen_cache.clear()
 
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS articles_seen (
-        source TEXT NOT NULL,
-        external_id TEXT NOT NULL,
-        title TEXT,
-        first_seen_ts DATETIME DEFAULT CURRENT_TIMESTAMP,
-        PRIMARY KEY (source, external_id)
-    )
-    """)
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS videos_made (
-        video_path TEXT PRIMARY KEY,
-        title TEXT,
-        uploaded_youtube INTEGER DEFAULT 0,
-        uploaded_tiktok INTEGER DEFAULT 0,
-        created_ts DATETIME DEFAULT CURRENT_TIMESTAMP
-    )
-    """)
-    conn.commit()
-    conn.close()
+    with _lock:
+        conn = get_conn()
+        c = conn.cursor()
+        c.execute("""
+        CREATE TABLE IF NOT EXISTS articles_seen (
+            source TEXT NOT NULL,
+            external_id TEXT NOT NULL,
+            title TEXT,
+            first_seen_ts DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (source, external_id)
+        )
+        """)
+        c.execute("""
+        CREATE TABLE IF NOT EXISTS videos_made (
+            video_path TEXT PRIMARY KEY,
+            title TEXT,
+            uploaded_youtube INTEGER DEFAULT 0,
+            uploaded_tiktok INTEGER DEFAULT 0,
+            created_ts DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        """)
+        c.execute("""
+        CREATE TABLE IF NOT EXISTS source_state (
+            source TEXT NOT NULL,
+            state_key TEXT NOT NULL,
+            etag TEXT,
+            last_modified TEXT,
+            cursor TEXT,
+            updated_ts DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (source, state_key)
+        )
+        """)
+        c.execute("""
+        CREATE TABLE IF NOT EXISTS article_fingerprints (
+            source TEXT NOT NULL,
+            external_id TEXT NOT NULL,
+            minhash BLOB NOT NULL,
+            seen_ts REAL NOT NULL,
+            PRIMARY KEY (source, external_id)
+        )
+        """)
+        c.execute("CREATE INDEX IF NOT EXISTS article_fingerprints_ts ON article_fingerprints(seen_ts)")
+        c.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            record TEXT NOT NULL,
+            completed TEXT NOT NULL DEFAULT '[]',
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            lease_owner TEXT,
+            lease_expires REAL,
+            not_before REAL,
+            created_ts DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_ts DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        """)
+        _add_column(c, "jobs", "not_before", "REAL")  # job tables created before retry backoff
+        c.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status)")
+        conn.commit()
+
+def _add_column(c, table: str, column: str, decl: str):
+    if column not in {row[1] for row in c.execute(f"PRAGMA table_info({table})")}:
+        c.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+def add_fingerprints(rows: List[Tuple[str, str, bytes, float]]):
+    # rows: (source, external_id, packed MinHash signature, seen_ts)
+    if not rows:
+        return
+    with _lock:
+        conn = get_conn()
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO article_fingerprints (source, external_id, minhash, seen_ts) VALUES (?, ?, ?, ?)", rows)
+
+def load_fingerprints(since_ts: float) -> List[Tuple[str, str, bytes, float]]:
+    # Oldest first, as the in-memory window expires from the left
+    with _lock:
+        return get_conn().execute(
+            "SELECT source, external_id, minhash, seen_ts FROM article_fingerprints WHERE seen_ts >= ? ORDER BY seen_ts",
+            (since_ts,),
+        ).fetchall()
+
+def prune_fingerprints(before_ts: float):
+    with _lock:
+        conn = get_conn()
+        with conn:
+            conn.execute("DELETE FROM article_fingerprints WHERE seen_ts < ?", (before_ts,))
+
+def get_source_state(source: str, state_key: str) -> dict:
+    # Per-source fetch state: HTTP validators plus a free-form cursor/high-water mark
+    with _lock:
+        row = get_conn().execute(
+            "SELECT etag, last_modified, cursor FROM source_state WHERE source=? AND state_key=?", (source, state_key)
+        ).fetchone()
+    if row is None:
+        return {}
+    return {"etag": row[0], "last_modified": row[1], "cursor": row[2]}
+
+def set_source_state(source: str, state_key: str, **fields):
+    # Updates only the given fields (etag, last_modified, cursor)
+    state = {**get_source_state(source, state_key), **fields}
+    with _lock:
+        conn = get_conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO source_state (source, state_key, etag, last_modified, cursor, updated_ts) "
+                "VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)",
+                (source, state_key, state.get("etag"), state.get("last_modified"), state.get("cursor")),
+            )
+
+def _remember(keys: Iterable[Tuple[str, str]]):
+    for k in keys:
+        _seen_cache[k] = None
+        _seen_cache.move_to_end(k)
+    while len(_seen_cache) > SEEN_CACHE_SIZE:
+        _seen_cache.popitem(last=False)
+
+def filter_unseen(keys: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    """
+    Return the (source, external_id) keys not in articles_seen, in input
+    order. Keys hit in the front cache skip the DB; the rest are checked
+    with one set-based query per 400 keys.
+    """
+    with _lock:
+        todo = list(dict.fromkeys(k for k in keys if k not in _seen_cache))
+        seen = set()
+        conn = get_conn()
+        for i in range(0, len(todo), 400):
+            chunk = todo[i:i + 400]
+            values = ",".join(["(?, ?)"] * len(chunk))
+            rows = conn.execute(
+                f"SELECT source, external_id FROM articles_seen WHERE (source, external_id) IN (VALUES {values})",
+                [v for k in chunk for v in k],
+            ).fetchall()
+            seen.update((r[0], r[1]) for r in rows)
+        _remember(seen)
+        return [k for k in keys if k not in _seen_cache and k not in seen]
+
+def mark_seen_many(rows: List[Tuple[str, str, str]]):
+    # rows: (source, external_id, title), inserted in a single transaction
+    if not rows:
+        return
+    with _lock:
+        conn = get_conn()
+        with conn:
+            conn.executemany("INSERT OR IGNORE INTO articles_seen (source, external_id, title) VALUES (?, ?, ?)", rows)
+        _remember((r[0], r[1]) for r in rows)
 
 def already_seen(source: str, external_id: str) -> bool:
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT 1 FROM articles_seen WHERE source=? AND external_id=?", (source, external_id))
-    row = c.fetchone()
-    conn.close()
-    return row is not None
+    return not filter_unseen([(source, external_id)])
 
 def mark_seen(source: str, external_id: str, title: str):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("INSERT OR IGNORE INTO articles_seen (source, external_id, title) VALUES (?, ?, ?)", (source, external_id, title))
-    conn.commit()
-    conn.close()
+    mark_seen_many([(source, external_id, title)])
 
 def mark_video(video_path: str, title: str, yt: int, tt: int):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("INSERT OR REPLACE INTO videos_made (video_path, title, uploaded_youtube, uploaded_tiktok) VALUES (?, ?, ?, ?)",
-              (video_path, title, yt, tt))
-    conn.commit()
-    conn.close()
+    with _lock:
+        conn = get_conn()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO videos_made (video_path, title, uploaded_youtube, uploaded_tiktok) VALUES (?, ?, ?, ?)",
+                         (video_path, title, yt, tt))
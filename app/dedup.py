@@ -0,0 +1,116 @@
+import os, re, time, random, hashlib
+from array import array
+from collections import defaultdict, deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+from .models import Article
+from . import db
+
+# Near-duplicate story detection across sources. Each article gets a MinHash
+# signature of its title/lead words; LSH splits the signature into bands so
+# only articles sharing a band bucket are compared, and a candidate counts as
+# a duplicate when its estimated Jaccard similarity clears the threshold.
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+_PRIME = (1 << 61) - 1
+_rng = random.Random(0x5EED)  # fixed seed: signatures must be stable across runs
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+_WORD = re.compile(r"[a-z0-9]+")
+_STOP = frozenset("a an and are as at be by for from has in is it its of on or that the to was were will with".split())
+
+def shingles(title: str, body: str = "", body_words: int = 40) -> Set[str]:
+    # Title words plus the lead of the body (NewsAPI bodies are truncated anyway)
+    words = _WORD.findall((title or "").lower()) + _WORD.findall((body or "").lower())[:body_words]
+    return {w for w in words if w not in _STOP}
+
+def minhash(tokens: Set[str]) -> Tuple[int, ...]:
+    hashes = [int.from_bytes(hashlib.blake2b(t.encode("utf-8"), digest_size=8).digest(), "big") for t in tokens]
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMS)
+
+def similarity(sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+    # Fraction of agreeing slots estimates Jaccard similarity
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / NUM_PERM
+
+def _bands(sig: Tuple[int, ...]) -> List[Tuple[int, Tuple[int, ...]]]:
+    return [(b, sig[b * ROWS:(b + 1) * ROWS]) for b in range(BANDS)]
+
+class NearDupIndex:
+    """
+    Rolling window of recent article signatures. check_and_add() answers
+    "is this a near-duplicate of something from the last `window_hours`?"
+    with BANDS dict lookups plus a comparison per candidate.
+    """
+
+    def __init__(self, window_hours: Optional[float] = None, threshold: Optional[float] = None):
+        self.window = 3600 * (window_hours if window_hours is not None else float(os.getenv("NEAR_DUP_WINDOW_HOURS", "48")))
+        self.threshold = threshold if threshold is not None else float(os.getenv("NEAR_DUP_THRESHOLD", "0.6"))
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], Set[str]] = defaultdict(set)
+        self._entries: Dict[str, Tuple[Tuple[int, ...], float]] = {}  # "source:external_id" -> (sig, ts)
+        self._order: Deque[Tuple[float, str]] = deque()
+        since = time.time() - self.window
+        db.prune_fingerprints(since)
+        for source, external_id, blob, ts in db.load_fingerprints(since):
+            self._insert(f"{source}:{external_id}", tuple(array("Q", blob)), ts)
+
+    def _insert(self, key: str, sig: Tuple[int, ...], ts: float):
+        self._entries[key] = (sig, ts)
+        self._order.append((ts, key))
+        for band in _bands(sig):
+            self._buckets[band].add(key)
+
+    def _expire(self, now: float):
+        expired = False
+        while self._order and self._order[0][0] < now - self.window:
+            ts, key = self._order.popleft()
+            expired = True
+            entry = self._entries.pop(key, None)
+            if entry:
+                for band in _bands(entry[0]):
+                    self._buckets[band].discard(key)
+        if expired:
+            db.prune_fingerprints(now - self.window)
+
+    def match(self, sig: Tuple[int, ...]) -> Optional[str]:
+        candidates = set()
+        for band in _bands(sig):
+            candidates |= self._buckets.get(band, set())
+        best, best_sim = None, self.threshold
+        for key in candidates:
+            sim = similarity(sig, self._entries[key][0])
+            if sim >= best_sim:
+                best, best_sim = key, sim
+        return best
+
+    def check_and_add(self, articles: List[Article]) -> Tuple[List[Article], List[Tuple[Article, str]]]:
+        """
+        Split `articles` into (fresh, duplicates). Fresh ones are added to
+        the index (and persisted); duplicates come back with the key of the
+        story they repeat.
+        """
+        now = time.time()
+        self._expire(now)
+        fresh, dups, rows = [], [], []
+        for a in articles:
+            tokens = shingles(a.title, a.body or "")
+            if not tokens:
+                fresh.append(a)  # nothing to compare on
+                continue
+            sig = minhash(tokens)
+            hit = self.match(sig)
+            if hit:
+                dups.append((a, hit))
+                continue
+            self._insert(f"{a.source}:{a.external_id}", sig, now)
+            rows.append((a.source, a.external_id, array("Q", sig).tobytes(), now))
+            fresh.append(a)
+        db.add_fingerprints(rows)
+        return fresh, dups
+
+_index: Optional[NearDupIndex] = None
+
+def get_near_dup_index() -> NearDupIndex:
+    global _index
+    if _index is None:
+        _index = NearDupIndex()
+    return _index
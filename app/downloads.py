@@ -0,0 +1,105 @@
+import os, asyncio, httpx
+from pathlib import Path
+from typing import Dict, List, Optional
+from .media_cache import MediaStore
+from . import metrics
+
+class DownloadManager:
+    """
+    Async downloader on one shared, keep-alive AsyncClient (HTTP/2 when `h2`
+    is installed). Concurrency is bounded, partial files are resumed with
+    Range requests, and concurrent requests for the same URL share one
+    transfer.
+    """
+
+    def __init__(self, concurrency: Optional[int] = None):
+        self.concurrency = concurrency or int(os.getenv("DOWNLOAD_CONCURRENCY", "6"))
+        self._client: Optional[httpx.AsyncClient] = None
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            try:
+                import h2  # noqa: F401
+                http2 = True
+            except ImportError:
+                http2 = False
+                print("[WARN] h2 not installed; media downloads use HTTP/1.1 (pip install 'httpx[http2]')")
+            self._client = httpx.AsyncClient(
+                http2=http2,
+                follow_redirects=True,
+                # a stalled transfer fails after `read` seconds instead of hanging the article
+                timeout=httpx.Timeout(30, read=60),
+                limits=httpx.Limits(max_connections=self.concurrency * 2, max_keepalive_connections=self.concurrency),
+            )
+            self._sem = asyncio.Semaphore(self.concurrency)
+        return self._client
+
+    async def _download(self, store: MediaStore, url: str, query: Optional[str]) -> Path:
+        client = self.client()
+        tmp = store.tmp_path(url)
+        async with self._sem, metrics.span("download") as sp:
+            offset = tmp.stat().st_size if tmp.exists() else 0
+            sp.set(cache_hit=False, resumed_from=offset)
+            headers = {"Range": f"bytes={offset}-"} if offset else {}
+            async with client.stream("GET", url, headers=headers) as r:
+                if offset and r.status_code == 416:
+                    pass  # partial file is already complete
+                else:
+                    r.raise_for_status()
+                    # 206 -> append to what we have; 200 -> server ignored Range, start over
+                    mode = "ab" if offset and r.status_code == 206 else "wb"
+                    n = 0
+                    with open(tmp, mode) as f:
+                        async for chunk in r.aiter_bytes():
+                            f.write(chunk)
+                            n += len(chunk)
+                    sp.set(bytes=n)
+        return await asyncio.to_thread(store.put_file, url, tmp, query)
+
+    def _finished(self, url: str, task: asyncio.Task):
+        self._inflight.pop(url, None)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"[WARN] Download failed {url}: {task.exception()}")
+
+    async def fetch(self, store: MediaStore, url: str, query: Optional[str] = None) -> Path:
+        cached = store.lookup_url(url)
+        if cached:
+            metrics.inc(f"{metrics.PREFIX}_cache_total", 1, "Cache lookups by result", stage="download", result="hit")
+            return cached
+        task = self._inflight.get(url)
+        if task is None:
+            task = asyncio.create_task(self._download(store, url, query))
+            self._inflight[url] = task
+            task.add_done_callback(lambda t: self._finished(url, t))
+        # shield: a caller giving up does not abort a transfer others may await
+        return await asyncio.shield(task)
+
+    async def fetch_all(self, store: MediaStore, urls: List[str], query: Optional[str] = None,
+                        deadline: Optional[float] = None) -> List[Optional[Path]]:
+        """
+        Download `urls` concurrently and return one entry per URL: the file if
+        it finished within `deadline` seconds, else None. Unfinished transfers
+        keep running in the background and land in the store for later articles.
+        """
+        if not urls:
+            return []
+        tasks = [asyncio.create_task(self.fetch(store, u, query)) for u in urls]
+        done, pending = await asyncio.wait(tasks, timeout=deadline)
+        for t in pending:
+            t.cancel()
+        return [t.result() if t in done and t.exception() is None else None for t in tasks]
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+_manager: Optional[DownloadManager] = None
+
+def get_download_manager() -> DownloadManager:
+    global _manager
+    if _manager is None:
+        _manager = DownloadManager()
+    return _manager
@@ -0,0 +1,31 @@
+import os, asyncio, httpx
+from typing import Optional
+
+# One pooled AsyncClient shared by every source, plus a global cap on
+# concurrent requests so fanning out sources/sub-requests stays polite.
+
+_client: Optional[httpx.AsyncClient] = None
+_sem: Optional[asyncio.Semaphore] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    global _client, _sem
+    if _client is None:
+        limit = int(os.getenv("FETCH_CONCURRENCY", "8"))
+        _client = httpx.AsyncClient(
+            timeout=30,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=limit, max_keepalive_connections=limit),
+        )
+        _sem = asyncio.Semaphore(limit)
+    return _client
+
+async def request(method: str, url: str, **kwargs) -> httpx.Response:
+    client = get_http_client()
+    async with _sem:
+        return await client.request(method, url, **kwargs)
+
+async def close_http_client():
+    global _client, _sem
+    if _client is not None:
+        await _client.aclose()
+        _client, _sem = None, None
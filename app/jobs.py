@@ -0,0 +1,210 @@
+import os, json, time, socket, asyncio, hashlib
+from pathlib import Path
+from typing import List, Optional, Set, Tuple
+from .models import Article, VideoJob
+from . import db
+
+# Durable job queue. Every article handed to the pipeline gets a row in
+# `jobs` holding its VideoJob record (artifacts so far) and the list of
+# completed stages; a restarted process resumes from the last checkpoint.
+#
+# Several processes (one poller, N workers) can share the table: a process
+# only runs a job while it holds the job's lease, renews its leases with a
+# heartbeat, and a lease that stops being renewed expires so another worker
+# reclaims the job. Claims rely on SQLite's file locking, so the supported
+# setup is every process on one host with DB_PATH on a local disk. Workers on
+# other hosts only claim safely if DB_PATH is on a filesystem with working
+# POSIX locks and DB_JOURNAL_MODE=DELETE (WAL never works across hosts).
+#
+# A failed job waits JOB_RETRY_SECONDS (doubling per attempt, capped at
+# JOB_RETRY_MAX_SECONDS) before it can be claimed again.
+
+STAGES = ["script", "voice", "media", "captions", "render", "upload"]
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "120"))
+
+_held: Set[str] = set()  # job ids this process currently leases
+
+def job_id(article: Article) -> str:
+    return hashlib.sha1(f"{article.source}:{article.external_id}".encode("utf-8")).hexdigest()[:16]
+
+def _max_attempts() -> int:
+    return int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+def _retry_delay(attempts: int) -> float:
+    base = float(os.getenv("JOB_RETRY_SECONDS", "60"))
+    return min(base * 2 ** max(0, attempts - 1), float(os.getenv("JOB_RETRY_MAX_SECONDS", "3600")))
+
+def _valid_prefix(rec: VideoJob, completed: List[str]) -> List[str]:
+    """
+    Completed stages whose artifacts are still usable. Files can disappear
+    between runs (cache eviction, cleanup); the first stage with a missing
+    artifact and everything after it will run again.
+    """
+    ok = []
+    for stage in STAGES:
+        if stage not in completed:
+            break
+        if stage == "voice" and not (rec.audio_path and Path(rec.audio_path).exists()):
+            break
+        if stage == "media" and not all(Path(p).exists() for p in rec.img_paths + rec.vid_paths):
+            break
+        if stage == "render" and not (rec.output_video_path and Path(rec.output_video_path).exists()):
+            break
+        ok.append(stage)
+    return ok
+
+def _take_lease(conn, jid: str):
+    conn.execute(
+        "UPDATE jobs SET status='running', attempts=attempts+1, lease_owner=?, lease_expires=?, not_before=NULL, "
+        "updated_ts=CURRENT_TIMESTAMP WHERE id=?",
+        (WORKER_ID, time.time() + LEASE_SECONDS, jid),
+    )
+    _held.add(jid)
+
+def open_job(article: Article, voice_id: str) -> Tuple[str, VideoJob, List[str], str]:
+    """
+    Create the job row for `article` (or load the existing one), lease it to
+    this process and count an attempt. Returns (id, record, completed stages,
+    status); status is "done" or "leased" (another worker holds it) when
+    there is nothing to run.
+    """
+    jid = job_id(article)
+    with db._lock:
+        conn = db.get_conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT record, completed, status, lease_owner, lease_expires FROM jobs WHERE id=?", (jid,)).fetchone()
+            if row is None:
+                rec = VideoJob(article=article, voice_id=voice_id)
+                conn.execute("INSERT INTO jobs (id, record, status) VALUES (?, ?, 'pending')", (jid, rec.model_dump_json()))
+                _take_lease(conn, jid)
+                return jid, rec, [], "running"
+            rec = VideoJob.model_validate_json(row[0])
+            if row[2] == "done":
+                return jid, rec, json.loads(row[1]), "done"
+            if row[3] not in (None, WORKER_ID) and (row[4] or 0) > time.time():
+                return jid, rec, json.loads(row[1]), "leased"
+            _take_lease(conn, jid)
+    return jid, rec, _valid_prefix(rec, json.loads(row[1])), "running"
+
+def enqueue(article: Article, voice_id: str) -> bool:
+    # Poller side: add a pending job for the workers; False if it already exists
+    with db._lock:
+        conn = db.get_conn()
+        with conn:
+            cur = conn.execute("INSERT OR IGNORE INTO jobs (id, record, status) VALUES (?, ?, 'pending')",
+                               (job_id(article), VideoJob(article=article, voice_id=voice_id).model_dump_json()))
+    return cur.rowcount > 0
+
+_CLAIMABLE = ("status IN ('pending', 'running', 'failed') AND attempts < ? "
+              "AND (lease_owner IS NULL OR lease_expires < ?) AND (not_before IS NULL OR not_before <= ?)")
+
+def _claimable_args(max_attempts: Optional[int] = None) -> tuple:
+    now = time.time()
+    return (max_attempts or _max_attempts(), now, now)
+
+def claim() -> Optional[Tuple[str, VideoJob, List[str]]]:
+    """
+    Lease the oldest runnable job: pending, failed with attempts to spare and
+    its retry delay over, or running under a lease that expired (its worker
+    died). None if idle.
+    """
+    with db._lock:
+        conn = db.get_conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")  # claim is select-then-update; keep other processes out
+            row = conn.execute(f"SELECT id, record, completed FROM jobs WHERE {_CLAIMABLE} ORDER BY created_ts LIMIT 1",
+                               _claimable_args()).fetchone()
+            if row is None:
+                return None
+            _take_lease(conn, row[0])
+    rec = VideoJob.model_validate_json(row[1])
+    return row[0], rec, _valid_prefix(rec, json.loads(row[2]))
+
+def renew() -> List[str]:
+    """
+    Extend every lease this process holds. Returns the ids whose lease was
+    lost (expired and reclaimed by another worker); they are forgotten here.
+    """
+    lost = []
+    with db._lock:
+        conn = db.get_conn()
+        with conn:
+            for jid in list(_held):
+                cur = conn.execute("UPDATE jobs SET lease_expires=? WHERE id=? AND lease_owner=?",
+                                   (time.time() + LEASE_SECONDS, jid, WORKER_ID))
+                if cur.rowcount == 0:
+                    _held.discard(jid)
+                    lost.append(jid)
+    return lost
+
+async def heartbeat_loop(interval: Optional[float] = None):
+    # Renew well inside the lease so one slow DB write does not cost the job
+    while True:
+        await asyncio.sleep(interval or LEASE_SECONDS / 3)
+        try:
+            for jid in await asyncio.to_thread(renew):
+                print(f"[WARN] Lost lease on job {jid}; another worker took it over")
+        except Exception as e:
+            print("[WARN] Job heartbeat failed:", e)
+
+def checkpoint(jid: str, stage: str, rec: VideoJob, completed: List[str]) -> bool:
+    """
+    Save the record after `stage`. The last stage marks the job done and
+    releases the lease. False if this process no longer holds the lease.
+    """
+    done = stage == STAGES[-1]
+    with db._lock:
+        conn = db.get_conn()
+        with conn:
+            cur = conn.execute(
+                "UPDATE jobs SET record=?, completed=?, status=?, error=NULL, updated_ts=CURRENT_TIMESTAMP"
+                + (", lease_owner=NULL, lease_expires=NULL" if done else "")
+                + " WHERE id=? AND lease_owner=?",
+                (rec.model_dump_json(), json.dumps(completed), "done" if done else "running", jid, WORKER_ID),
+            )
+    if done or cur.rowcount == 0:
+        _held.discard(jid)
+    return cur.rowcount > 0
+
+def fail(jid: str, stage: str, error: str, rec: Optional[VideoJob] = None):
+    # `rec` keeps partial progress of the failed stage (e.g. one of two uploads done)
+    with db._lock:
+        conn = db.get_conn()
+        with conn:
+            if rec is not None:
+                conn.execute("UPDATE jobs SET record=? WHERE id=? AND lease_owner=?", (rec.model_dump_json(), jid, WORKER_ID))
+            row = conn.execute("SELECT attempts FROM jobs WHERE id=?", (jid,)).fetchone()
+            conn.execute("UPDATE jobs SET status='failed', error=?, lease_owner=NULL, lease_expires=NULL, not_before=?, "
+                         "updated_ts=CURRENT_TIMESTAMP WHERE id=? AND lease_owner=?",
+                         (f"{stage}: {error}"[:2000], time.time() + _retry_delay(row[0] if row else 1), jid, WORKER_ID))
+    _held.discard(jid)
+
+def release_all():
+    # Graceful shutdown: hand unfinished jobs straight back instead of waiting for expiry
+    with db._lock:
+        conn = db.get_conn()
+        with conn:
+            conn.executemany("UPDATE jobs SET lease_owner=NULL, lease_expires=NULL WHERE id=? AND lease_owner=?",
+                             [(jid, WORKER_ID) for jid in _held])
+    _held.clear()
+
+def pending_count() -> int:
+    with db._lock:
+        return db.get_conn().execute(f"SELECT COUNT(*) FROM jobs WHERE {_CLAIMABLE}",
+                                     _claimable_args()).fetchone()[0]
+
+def unfinished(max_attempts: Optional[int] = None) -> List[Tuple[str, VideoJob]]:
+    """
+    Jobs left running by a crashed process or failed with attempts to spare
+    and their retry delay over, oldest first. Jobs under a live lease belong
+    to another worker.
+    """
+    with db._lock:
+        rows = db.get_conn().execute(
+            f"SELECT id, record FROM jobs WHERE {_CLAIMABLE} ORDER BY created_ts",
+            _claimable_args(max_attempts),
+        ).fetchall()
+    return [(jid, VideoJob.model_validate_json(rec)) for jid, rec in rows]
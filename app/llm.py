@@ -1,16 +1,22 @@
-import os
-from typing import Tuple
+import os, json, re, hashlib
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
 from .models import Script
+from . import metrics
 from jinja2 import Template
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential
 
 # OpenAI SDK (chat completions)
 try:
-    from openai import OpenAI
+    from openai import AsyncOpenAI, APIConnectionError, APITimeoutError, RateLimitError, InternalServerError
+    _RETRYABLE = (APIConnectionError, APITimeoutError, RateLimitError, InternalServerError)
 except Exception:
-    OpenAI = None
+    AsyncOpenAI = None
+    _RETRYABLE = ()
 
-SCRIPT_TMPL = Template(
-"""Write a 40-second TikTok/YouTube Shorts script in a hype, fast-paced tone.
+SYSTEM_PROMPT = "You are a master shorts scriptwriter."
+
+SCRIPT_SRC = """Write a 40-second TikTok/YouTube Shorts script in a hype, fast-paced tone.
 Make it extremely clickbait (but add the phrase "(not clickbait)" in the title).
 Structure it with:
 1) HOOK (<= 10 words, shocking, pattern interrupt)
@@ -21,32 +27,78 @@ Return JSON with keys: title, hook, body, cta.
 Topic context:
 {{ context }}
 """
-)
+SCRIPT_TMPL = Template(SCRIPT_SRC)
+
+BATCH_SRC = """Write one 40-second TikTok/YouTube Shorts script for EACH topic below, in a hype, fast-paced tone.
+Make each extremely clickbait (but add the phrase "(not clickbait)" in the title).
+Structure each with:
+1) HOOK (<= 10 words, shocking, pattern interrupt)
+2) PAYOFF (explain the trick/tool in concrete steps)
+3) CTA (follow/save/share).
+
+Return a JSON object {"scripts": [...]} with exactly {{ contexts|length }} objects, in topic order,
+each with keys: title, hook, body, cta.
+{% for c in contexts %}
+Topic {{ loop.index }}:
+{{ c }}
+{% endfor %}
+"""
+BATCH_TMPL = Template(BATCH_SRC)
 
-def use_openai(context: str) -> Script:
+_client = None
+
+def _model() -> str:
+    return os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+
+def _temperature() -> float:
+    return float(os.getenv("OPENAI_TEMPERATURE", "0.9"))
+
+def _get_client():
+    global _client
     api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key or OpenAI is None:
+    if not api_key or AsyncOpenAI is None:
         raise RuntimeError("OPENAI_API_KEY missing or openai SDK not installed.")
-    client = OpenAI(api_key=api_key)
-    prompt = SCRIPT_TMPL.render(context=context)
-    resp = client.chat.completions.create(
-        model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
-        messages=[
-            {"role":"system", "content":"You are a master shorts scriptwriter."},
-            {"role":"user", "content": prompt}
-        ],
-        temperature=0.9,
-    )
-    text = resp.choices[0].message.content
+    if _client is None:
+        # retries are handled below so they share one backoff policy
+        _client = AsyncOpenAI(api_key=api_key, max_retries=0)
+    return _client
+
+# --- script cache -------------------------------------------------------
+
+def _cache_dir() -> Path:
+    return Path(os.getenv("SCRIPT_CACHE_DIR", str(Path(os.getenv("OUTPUT_DIR","output")) / "cache" / "scripts")))
+
+def cache_key(context: str, model: Optional[str] = None, temperature: Optional[float] = None) -> str:
+    tmpl_hash = hashlib.sha256(SCRIPT_SRC.encode("utf-8")).hexdigest()
+    blob = json.dumps([tmpl_hash, context, model or _model(), temperature if temperature is not None else _temperature()])
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+def _cache_get(context: str) -> Optional[Script]:
+    p = _cache_dir() / f"{cache_key(context)}.json"
+    if not p.exists():
+        return None
+    try:
+        return Script.model_validate_json(p.read_text(encoding="utf-8"))
+    except Exception:
+        return None
+
+def _cache_put(context: str, script: Script):
+    d = _cache_dir()
+    d.mkdir(parents=True, exist_ok=True)
+    p = d / f"{cache_key(context)}.json"
+    tmp = p.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(script.model_dump_json(), encoding="utf-8")
+    os.replace(tmp, p)
+
+# --- parsing ------------------------------------------------------------
+
+def _extract_json(text: str):
     # Best-effort JSON extraction
-    import json, re
     json_str = text.strip().strip('`')
     json_str = re.sub(r'^json\n', '', json_str, flags=re.I)
-    try:
-        data = json.loads(json_str)
-    except Exception:
-        # fallback split
-        data = {"title":"", "hook":"", "body":text, "cta":""}
+    return json.loads(json_str)
+
+def _to_script(data: dict) -> Script:
     full = f"{data.get('hook','')}. {data.get('body','')}. {data.get('cta','')}"
     return Script(
         title=(data.get("title") or "").strip(),
@@ -56,6 +108,224 @@ def use_openai(context: str) -> Script:
         full_text=full.strip()
     )
 
-def generate_script(context: str) -> Script:
+def _parse_script(text: str) -> Tuple[Script, bool]:
+    # Returns (script, parsed); parsed is False for the raw-text fallback, which must not be cached
+    try:
+        data = _extract_json(text)
+    except Exception:
+        # fallback split
+        return _to_script({"title":"", "hook":"", "body":text, "cta":""}), False
+    return _to_script(data), True
+
+# --- provider -----------------------------------------------------------
+
+# One backoff policy for every OpenAI call
+_retry = retry(retry=retry_if_exception_type(_RETRYABLE), wait=wait_exponential(multiplier=1, min=1, max=30),
+               stop=stop_after_attempt(4), reraise=True)
+
+@_retry
+async def _complete(prompt: str, json_mode: bool = False) -> str:
+    kwargs = {"response_format": {"type": "json_object"}} if json_mode else {}
+    resp = await _get_client().chat.completions.create(
+        model=_model(),
+        messages=[
+            {"role":"system", "content":SYSTEM_PROMPT},
+            {"role":"user", "content": prompt}
+        ],
+        temperature=_temperature(),
+        **kwargs,
+    )
+    return resp.choices[0].message.content
+
+async def use_openai(context: str) -> Script:
+    async with metrics.span("llm", mode="blocking") as sp:
+        cached = _cache_get(context)
+        sp.set(cache_hit=cached is not None)
+        if cached:
+            return cached
+        text = await _complete(SCRIPT_TMPL.render(context=context))
+        sp.set(bytes=len(text.encode("utf-8")))
+        script, parsed = _parse_script(text)
+        if parsed:
+            _cache_put(context, script)
+        else:
+            print("[WARN] Script response was not valid JSON; using raw text, not caching it")
+        return script
+
+async def generate_script(context: str) -> Script:
     # Extendable: add other providers (Ollama local, OpenRouter, etc.)
-    return use_openai(context)
+    return await use_openai(context)
+
+async def generate_scripts_batch(contexts: List[str]) -> List[Script]:
+    """
+    Generate scripts for several topics in one completion. Cached topics are
+    skipped; if the model returns the wrong number of scripts, the missing
+    ones fall back to one request each.
+    """
+    out: List[Optional[Script]] = [_cache_get(c) for c in contexts]
+    todo = [i for i, s in enumerate(out) if s is None]
+    if len(todo) > 1:
+        try:
+            async with metrics.span("llm", mode="batch") as sp:
+                sp.set(cache_hit=False, topics=len(todo))
+                text = await _complete(BATCH_TMPL.render(contexts=[contexts[i] for i in todo]), json_mode=True)
+                sp.set(bytes=len(text.encode("utf-8")))
+            data = _extract_json(text)
+            items = data.get("scripts", []) if isinstance(data, dict) else data
+            if len(items) == len(todo):
+                for i, item in zip(todo, items):
+                    out[i] = _to_script(item)
+                    _cache_put(contexts[i], out[i])
+        except Exception as e:
+            print(f"[WARN] Batch script generation failed, falling back to single requests: {e}")
+    for i, s in enumerate(out):
+        if s is None:
+            out[i] = await use_openai(contexts[i])
+    return out
+
+# --- streaming ----------------------------------------------------------
+
+@_retry
+async def _open_stream(prompt: str):
+    # Only opening the stream is retried; a stream that breaks midway fails the stage
+    return await _get_client().chat.completions.create(
+        model=_model(),
+        messages=[
+            {"role":"system", "content":SYSTEM_PROMPT},
+            {"role":"user", "content": prompt}
+        ],
+        temperature=_temperature(),
+        stream=True,
+    )
+
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+|\n+')  # same split as tts.split_script
+
+class ScriptStreamParser:
+    """
+    Incremental parser for the streamed {"title","hook","body","cta"} object.
+    feed() returns (key, text) pieces as soon as they are final: a whole
+    value for most keys, and each finished sentence for keys in `split_keys`.
+    """
+
+    def __init__(self, split_keys=("body",)):
+        self.split_keys = set(split_keys)
+        self.depth = 0
+        self.in_str = False
+        self.esc = False
+        self.raw: List[str] = []
+        self.expect_key = False
+        self.key: Optional[str] = None
+        self.is_key = False
+        self.emitted = 0  # decoded chars of the current value already emitted
+        self.fields = {}
+
+    @staticmethod
+    def _decode(raw: str) -> Optional[str]:
+        try:
+            return json.loads(f'"{raw}"')
+        except Exception:
+            return None  # ends inside an escape sequence; retry with more input
+
+    def _sentences(self, done: bool) -> List[Tuple[str, str]]:
+        text = self._decode("".join(self.raw)) if not done else self.fields[self.key]
+        if text is None:
+            return []
+        out = []
+        for m in SENTENCE_SPLIT.finditer(text, self.emitted):
+            if m.end() == len(text) and not done:
+                break  # whitespace may continue in the next token
+            piece = text[self.emitted:m.start()].strip()
+            if piece:
+                out.append((self.key, piece))
+            self.emitted = m.end()
+        if done:
+            tail = text[self.emitted:].strip()
+            if tail:
+                out.append((self.key, tail))
+        return out
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        events = []
+        for ch in chunk:
+            if self.in_str:
+                if self.esc:
+                    self.esc = False
+                    self.raw.append(ch)
+                    if not self.is_key and self.key in self.split_keys and ch == "n":
+                        events.extend(self._sentences(done=False))
+                elif ch == "\\":
+                    self.esc = True
+                    self.raw.append(ch)
+                elif ch == '"':
+                    self.in_str = False
+                    text = self._decode("".join(self.raw)) or ""
+                    if self.is_key:
+                        self.key = text
+                    else:
+                        self.fields[self.key] = text
+                        if self.key in self.split_keys:
+                            events.extend(self._sentences(done=True))
+                        elif text.strip():
+                            events.append((self.key, text.strip()))
+                    self.raw = []
+                else:
+                    self.raw.append(ch)
+                    if not self.is_key and self.key in self.split_keys and ch == " ":
+                        events.extend(self._sentences(done=False))
+                continue
+            if ch == "{":
+                self.depth += 1
+                self.expect_key = self.depth == 1
+            elif ch == "}":
+                self.depth -= 1
+            elif ch == "[":
+                self.depth += 1
+            elif ch == "]":
+                self.depth -= 1
+            elif self.depth == 1 and ch == ",":
+                self.expect_key = True
+            elif self.depth == 1 and ch == ":":
+                self.expect_key = False
+            elif ch == '"' and self.depth == 1:
+                self.in_str = True
+                self.is_key = self.expect_key
+                self.emitted = 0
+        return events
+
+async def stream_script(context: str, on_piece: Optional[Callable[[str, str], None]] = None) -> Script:
+    """
+    Like generate_script, but streams the completion and calls
+    on_piece(key, text) for every hook/body sentence/cta as soon as it is
+    complete, so downstream work can start while the model is still writing.
+    """
+    async with metrics.span("llm", mode="stream") as sp:
+        cached = _cache_get(context)
+        sp.set(cache_hit=cached is not None)
+        if cached:
+            if on_piece:
+                for key in ("hook", "cta"):
+                    if getattr(cached, key):
+                        on_piece(key, getattr(cached, key))
+                for sentence in SENTENCE_SPLIT.split(cached.body):
+                    if sentence.strip():
+                        on_piece("body", sentence.strip())
+            return cached
+        stream = await _open_stream(SCRIPT_TMPL.render(context=context))
+        parser = ScriptStreamParser()
+        parts = []
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if not delta:
+                continue
+            parts.append(delta)
+            for key, text in parser.feed(delta):
+                if on_piece and key in ("hook", "body", "cta"):
+                    on_piece(key, text)
+        text = "".join(parts)
+        sp.set(bytes=len(text.encode("utf-8")))
+        script, parsed = _parse_script(text)
+        if parsed:
+            _cache_put(context, script)
+        else:
+            print("[WARN] Streamed script was not valid JSON; using raw text, not caching it")
+        return script
@@ -1,61 +1,302 @@
-import argparse, asyncio, os
+import argparse, asyncio, os, sys
 from pathlib import Path
 from .utils import load_env, get_env
 from .scheduler import run_poll_loop
-from .models import Article, VideoJob
-from .llm import generate_script
-from .tts import synthesize_elevenlabs
-from .stock_media import pixabay_search
-from .captions import naive_segments, whisper_segments
-from .video import compose_video
-from .upload.youtube import upload_video as yt_upload
-from .upload.tiktok import playwright_upload
-
-async def handle_articles(articles):
+from .models import Article, VideoJob, RenderSpec
+from .render_farm import RenderFarm, RenderError
+from .pipeline import Pipeline, Stage, stage_limit
+from .db import init_db, mark_video
+from . import jobs as jobstore
+from .http_pool import close_http_client
+from . import metrics, plugins, profiling
+
+# LLM, TTS, media, captions and uploaders come from app.plugins and are only
+# imported when their stage first runs; a poll that finds nothing new stays cheap.
+
+def _topic_context(art) -> str:
+    return f"Title: {art.title}\nBody: {art.body or ''}"
+
+def _start_early(job):
+    """
+    Streaming mode: the media query only needs the article, so start it now;
+    with chunked TTS, synthesize each hook/body/cta sentence as soon as the
+    model finishes it. The later stages pick up the same work (cached/in-flight).
+    """
+    job["media_task"] = asyncio.create_task(_fetch_media(job))
+    job["media_task"].add_done_callback(lambda t: t.cancelled() or t.exception())  # re-raised in the media stage
+    chunked = os.getenv("TTS_CHUNKED","0") == "1"
+    def on_piece(key, text):
+        if chunked:
+            t = asyncio.create_task(plugins.provider("tts").synthesize_elevenlabs(text, job["voice_id"], job["outdir"] / "audio"))
+            t.add_done_callback(lambda t: t.cancelled() or t.exception())  # errors resurface in the TTS stage
+    return on_piece
+
+async def _stage_script(job):
+    if job.get("script") is None:
+        if os.getenv("LLM_STREAM","0") == "1":
+            job["script"] = await plugins.provider("script").stream_script(_topic_context(job["article"]), _start_early(job))
+        else:
+            job["script"] = await plugins.provider("script").generate_script(_topic_context(job["article"]))
+    print("Generated title:", job["script"].title)
+    return job
+
+async def _stage_voice(job):
+    tts = plugins.provider("tts")
+    if os.getenv("TTS_CHUNKED","0") == "1":
+        # Chunk boundaries double as caption timing
+        job["audio_path"], job["segs"] = await tts.synthesize_chunked(job["script"], job["voice_id"], job["outdir"] / "audio")
+    else:
+        job["audio_path"] = await tts.synthesize_elevenlabs(job["script"].full_text, job["voice_id"], job["outdir"] / "audio")
+    return job
+
+async def _fetch_media(job):
+    art = job["article"]
+    img_paths, vid_paths = await plugins.provider("media")(
+        art.title or (art.topic or "technology"), job["outdir"] / "assets", max_items=5)
+    if os.getenv("PROXY_CLIPS","1") == "1":
+        from .proxies import ensure_proxies
+        from .media_cache import get_store
+        # Normalize once to 1080x1920 so renders skip per-frame scaling; proxies
+        # share the media store's quota
+        store = get_store(job["outdir"] / "assets")
+        img_paths, vid_paths = await asyncio.gather(
+            asyncio.to_thread(ensure_proxies, img_paths, store),
+            asyncio.to_thread(ensure_proxies, vid_paths, store),
+        )
+    return img_paths, vid_paths
+
+async def _stage_media(job):
+    task = job.pop("media_task", None)
+    job["img_paths"], job["vid_paths"] = await (task if task is not None else _fetch_media(job))
+    return job
+
+def _caption_segments(audio_path, full_text):
+    captions = plugins.provider("captions")
+    try:
+        return captions.whisper_segments(audio_path)
+    except Exception:
+        from pydub import AudioSegment
+        dur = AudioSegment.from_file(audio_path).duration_seconds
+        return captions.naive_segments(full_text, dur)
+
+async def _stage_captions(job):
+    if job.get("segs"):
+        return job
+    job["segs"] = await asyncio.to_thread(_caption_segments, job["audio_path"], job["script"].full_text)
+    return job
+
+async def _stage_render(job):
+    script, art = job["script"], job["article"]
+    safe_title = "".join([c for c in script.title if c.isalnum() or c in (" ","-","_")]).strip()[:90]
+    out_path = job["outdir"] / f"{safe_title or 'short'}_{art.external_id[:8]}.mp4"
+    spec = RenderSpec(
+        audio_path=str(job["audio_path"]),
+        img_paths=[str(p) for p in job["img_paths"]],
+        vid_paths=[str(p) for p in job["vid_paths"]],
+        captions=job["segs"],
+        brand_handle=job["brand"],
+        bgm_path=os.getenv("BGM_PATH"),
+        out_path=str(out_path),
+        threads=int(os.getenv("RENDER_FFMPEG_THREADS", "2")),
+        engine=os.getenv("RENDER_ENGINE", "moviepy"),
+        profile=profiling.modes_for_job(),
+    )
+    try:
+        # runs in a worker process, so it is timed from here
+        async with metrics.span("compose_video", engine=spec.engine) as sp:
+            job["out_path"] = await get_render_farm().render(spec)
+            sp.set(bytes=metrics.file_size(job["out_path"]))
+    except RenderError as e:
+        print("[WARN]", e)
+        return None
+    return job
+
+async def _stage_upload(job):
+    script, out_path, rec = job["script"], job["out_path"], job["record"]
+    tags = ["#shorts","#tiktok","#viral","#ai","#news"]
+    failed = []
+    # A resumed job skips uploads that already went through
+    try:
+        if os.getenv("UPLOAD_YOUTUBE","1") == "1" and not rec.youtube_id:
+            yt = await plugins.uploader("youtube")().upload(str(out_path), script.title, f"{script.hook}\n\n{script.body}\n\n{script.cta}", tags, categoryId="28", privacyStatus="public")
+            rec.youtube_id = yt.get("id")
+            print("YouTube video id:", rec.youtube_id)
+    except Exception as e:
+        print("[WARN] YouTube upload failed:", e)
+        failed.append(f"youtube: {e}")
+
+    try:
+        if os.getenv("UPLOAD_TIKTOK","0") == "1" and not rec.tiktok_posted:
+            await plugins.uploader("tiktok")().upload(str(out_path), f"{script.title} { ' '.join(tags) }")
+            rec.tiktok_posted = True
+    except Exception as e:
+        print("[WARN] TikTok upload failed:", e)
+        failed.append(f"tiktok: {e}")
+
+    mark_video(str(out_path), script.title, int(bool(rec.youtube_id)), int(rec.tiktok_posted))
+    if failed:
+        raise RuntimeError("; ".join(failed))
+    return job
+
+def _sync_record(job):
+    # Copy stage outputs from the runtime job dict into its persisted VideoJob
+    rec = job["record"]
+    rec.script = job.get("script")
+    rec.audio_path = str(job["audio_path"]) if job.get("audio_path") else None
+    rec.img_paths = [str(p) for p in job.get("img_paths") or []]
+    rec.vid_paths = [str(p) for p in job.get("vid_paths") or []]
+    rec.captions = job.get("segs")
+    rec.output_video_path = str(job["out_path"]) if job.get("out_path") else None
+
+def _job_from_record(jid, rec, completed, brand, outdir):
+    job = dict(job_id=jid, record=rec, completed=list(completed), article=rec.article,
+               voice_id=rec.voice_id, brand=brand, outdir=outdir)
+    if "script" in completed:
+        job["script"] = rec.script
+    if "voice" in completed:
+        job["audio_path"] = Path(rec.audio_path)
+        if rec.captions:
+            job["segs"] = rec.captions  # chunked TTS timing
+    if "media" in completed:
+        job["img_paths"] = [Path(p) for p in rec.img_paths]
+        job["vid_paths"] = [Path(p) for p in rec.vid_paths]
+    if "captions" in completed:
+        job["segs"] = rec.captions
+    if "render" in completed:
+        job["out_path"] = Path(rec.output_video_path)
+    return job
+
+def _checkpointed(stage, fn):
+    """
+    Wrap a stage so it is skipped when already completed for this job, and
+    its artifacts are checkpointed to the job table when it succeeds.
+    """
+    async def run(job):
+        if stage in job["completed"]:
+            return job
+        metrics.set_trace(job["job_id"])
+        try:
+            async with metrics.span(f"stage.{stage}"):
+                out = await fn(job)
+        except Exception as e:
+            _sync_record(job)
+            jobstore.fail(job["job_id"], stage, str(e), job["record"])
+            raise
+        if out is None:
+            jobstore.fail(job["job_id"], stage, "stage dropped the job")
+            return None
+        job["completed"].append(stage)
+        _sync_record(job)
+        if not jobstore.checkpoint(job["job_id"], stage, job["record"], job["completed"]):
+            print(f"[WARN] Job {job['job_id']} was reclaimed by another worker; dropping it here")
+            return None
+        return out
+    return run
+
+_render_farm = None
+_articles_in_flight = 0  # backlog signal for the adaptive poller
+
+def get_render_farm() -> RenderFarm:
+    global _render_farm
+    if _render_farm is None:
+        _render_farm = RenderFarm()
+    return _render_farm
+
+def build_pipeline() -> Pipeline:
+    # Network-bound stages get a few workers each; render fans out to the process pool
+    return Pipeline([
+        Stage("llm", _checkpointed("script", _stage_script), stage_limit("llm", 3)),
+        Stage("tts", _checkpointed("voice", _stage_voice), stage_limit("tts", 2)),
+        Stage("media", _checkpointed("media", _stage_media), stage_limit("media", 2)),
+        Stage("captions", _checkpointed("captions", _stage_captions), stage_limit("captions", 1)),
+        Stage("render", _checkpointed("render", _stage_render), stage_limit("render", get_render_farm().workers)),
+        # Uploads only wait on the uploader's own pools, so keep plenty in flight
+        # and never let a slow upload hold finished renders back
+        Stage("upload", _checkpointed("upload", _stage_upload), stage_limit("upload", 8)),
+    ])
+
+async def handle_articles(articles, limit=None):
+    global _articles_in_flight
     # Take first N for demo
-    n_each_run = int(os.getenv("N_PER_RUN","1"))
+    n_each_run = limit if limit is not None else int(os.getenv("N_PER_RUN","1"))
     brand = os.getenv("BRAND_HANDLE","@YourHandle")
     voice_id = os.getenv("ELEVENLABS_VOICE_ID","21m00Tcm4TlvDq8ikWAM")  # default voice id (Rachel in docs); replace
     outdir = Path(os.getenv("OUTPUT_DIR","output"))
 
+    # Every article gets a durable job row before any work starts
+    jobs = []
     for art in articles[:n_each_run]:
-        topic_context = f"Title: {art.title}\nBody: {art.body or ''}"
-        script = generate_script(topic_context)
-        print("Generated title:", script.title)
+        jid, rec, completed, status = jobstore.open_job(art, voice_id)
+        if status == "running":
+            jobs.append(_job_from_record(jid, rec, completed, brand, outdir))
+    _articles_in_flight += len(jobs)
+    try:
+        return await _run_jobs(jobs)
+    finally:
+        _articles_in_flight -= len(jobs)
 
-        # Voiceover
-        audio_path = synthesize_elevenlabs(script.full_text, voice_id, outdir / "audio")
+async def resume_jobs():
+    """
+    Pick up jobs a previous process left unfinished (crash, failed stage)
+    and continue each from its last checkpoint.
+    """
+    pending = jobstore.unfinished()
+    if not pending:
+        return []
+    print(f"[INFO] Resuming {len(pending)} unfinished jobs")
+    return await handle_articles([rec.article for _, rec in pending], limit=len(pending))
 
-        # Stock media
-        img_paths, vid_paths = pixabay_search(art.title or (art.topic or "technology"), outdir / "assets", max_items=5)
+def _log_resume_failure(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        print(f"[WARN] Resuming unfinished jobs failed: {task.exception()!r}")
 
-        # Caption segments
-        try:
-            segs = whisper_segments(audio_path)
-        except Exception:
-            from pydub import AudioSegment
-            dur = AudioSegment.from_file(audio_path).duration_seconds
-            segs = naive_segments(script.full_text, dur)
-
-        # Compose video
-        safe_title = "".join([c for c in script.title if c.isalnum() or c in (" ","-","_")]).strip()[:90]
-        out_path = outdir / f"{safe_title or 'short'}_{art.external_id[:8]}.mp4"
-        compose_video(audio_path, img_paths, vid_paths, segs, brand, os.getenv("BGM_PATH"), out_path)
-
-        # Uploads
-        tags = ["#shorts","#tiktok","#viral","#ai","#news"]
-        try:
-            if os.getenv("UPLOAD_YOUTUBE","1") == "1":
-                yt = yt_upload(str(out_path), script.title, f"{script.hook}\n\n{script.body}\n\n{script.cta}", tags, categoryId="28", privacyStatus="public")
-                print("YouTube video id:", yt.get("id"))
-        except Exception as e:
-            print("[WARN] YouTube upload failed:", e)
+async def _claimed_jobs(slots: asyncio.Semaphore):
+    # Endless stream of leased jobs. A slot is taken before each claim and
+    # given back when the job leaves the pipeline, so a worker never holds
+    # more leases than it can soon work on; the rest stay for other workers.
+    brand = os.getenv("BRAND_HANDLE","@YourHandle")
+    outdir = Path(os.getenv("OUTPUT_DIR","output"))
+    idle = float(os.getenv("WORKER_IDLE_SECONDS","5"))
+    while True:
+        await slots.acquire()
+        claimed = await asyncio.to_thread(jobstore.claim)
+        if claimed is None:
+            slots.release()
+            await asyncio.sleep(idle)
+            continue
+        jid, rec, completed = claimed
+        print(f"[INFO] Worker {jobstore.WORKER_ID} claimed job {jid}: {rec.article.title}")
+        yield _job_from_record(jid, rec, completed, brand, outdir)
+
+async def run_worker():
+    """
+    Worker mode: no polling, just claim jobs from the shared job table and
+    render/upload them. OUTPUT_DIR must be on storage every worker can see
+    so a job reclaimed from a dead worker finds its earlier artifacts.
+    """
+    # Jobs in flight: one per render slot plus a small prefetch for the pre-render stages
+    max_jobs = int(os.getenv("WORKER_MAX_JOBS", get_render_farm().workers + int(os.getenv("WORKER_PREFETCH", "2"))))
+    slots = asyncio.Semaphore(max(1, max_jobs))
+    print(f"[INFO] Worker {jobstore.WORKER_ID} started (up to {max_jobs} jobs at a time)")
+    def finished(job):
+        # Results are not collected: the worker never stops, so keeping them would grow forever
+        slots.release()
+        print(f"[INFO] Worker {jobstore.WORKER_ID} finished job {job['job_id']}")
+    def dropped(job):
+        slots.release()
+    await build_pipeline().run(_claimed_jobs(slots), on_result=finished, on_drop=dropped)
 
+async def _run_jobs(jobs):
+    todo = [j for j in jobs if j.get("script") is None]
+    if os.getenv("LLM_BATCH","0") == "1" and len(todo) > 1:
+        # One round-trip for the whole cycle instead of one per article
         try:
-            if os.getenv("UPLOAD_TIKTOK","0") == "1":
-                await playwright_upload(str(out_path), f"{script.title} { ' '.join(tags) }")
+            scripts = await plugins.provider("script").generate_scripts_batch([_topic_context(j["article"]) for j in todo])
+            for j, sc in zip(todo, scripts):
+                j["script"] = sc
         except Exception as e:
-            print("[WARN] TikTok upload failed:", e)
+            print("[WARN] Batch script generation failed:", e)
+    return await build_pipeline().run(jobs)
 
 async def main():
     load_env()
@@ -64,8 +305,16 @@ async def main():
     parser.add_argument("--n_videos", type=int, default=1)
     parser.add_argument("--niche", type=str, default="AI Tools")
     parser.add_argument("--loop", action="store_true", help="Keep polling forever")
+    parser.add_argument("--worker", action="store_true", help="Only render/upload jobs claimed from the job table")
+    parser.add_argument("--enqueue", action="store_true", help="With --loop: only poll and enqueue jobs for --worker processes")
+    parser.add_argument("--profile", help="Profile renders: comma-separated cpu,mem,frames (sets PROFILE_MODE)")
+    parser.add_argument("--profile-rate", type=int, help="Profile one render in N (sets PROFILE_SAMPLE_RATE)")
     args = parser.parse_args()
     os.environ["N_PER_RUN"] = str(args.n_videos)
+    if args.profile:
+        os.environ["PROFILE_MODE"] = args.profile
+    if args.profile_rate:
+        os.environ["PROFILE_SAMPLE_RATE"] = str(args.profile_rate)
     # If you prefer one-shot instead of loop, you can simulate one poll:
     async def on_articles(arts):
         if not arts:
@@ -73,20 +322,51 @@ async def main():
             return
         await handle_articles(arts)
     from .scheduler import build_sources, poll_once
-    sources, interval = build_sources(Path(args.config))
-    if args.loop:
-        async def on_articles_loop(arts):
-            await handle_articles(arts[:args.n_videos])
-        async def loop():
-            while True:
-                new_articles = await poll_once(sources)
-                await on_articles_loop(new_articles)
-                import asyncio
-                await asyncio.sleep(interval)
-        await loop()
-    else:
-        new_articles = await poll_once(sources)
-        await on_articles(new_articles[:args.n_videos])
+    init_db()
+    metrics.start_metrics_server()
+    heartbeat = asyncio.create_task(jobstore.heartbeat_loop())
+    resume = None
+    try:
+        if args.worker:
+            await run_worker()
+        elif args.loop:
+            async def on_articles_loop(arts):
+                if args.enqueue:
+                    voice_id = os.getenv("ELEVENLABS_VOICE_ID","21m00Tcm4TlvDq8ikWAM")
+                    added = sum(jobstore.enqueue(a, voice_id) for a in arts)
+                    print(f"[INFO] Enqueued {added} jobs")
+                    return
+                await handle_articles(arts[:args.n_videos])
+            if args.enqueue:
+                # Workers pick up unfinished jobs themselves; back off while they are behind
+                backlog = jobstore.pending_count
+            else:
+                resume = asyncio.create_task(resume_jobs())
+                resume.add_done_callback(_log_resume_failure)
+                backlog = lambda: _articles_in_flight
+            # Per-source adaptive timers; polling pauses while renders back up
+            await run_poll_loop(Path(args.config), on_articles_loop, backlog=backlog)
+        else:
+            await resume_jobs()
+            sources, interval = build_sources(Path(args.config))
+            new_articles = await poll_once(sources)
+            await on_articles(new_articles[:args.n_videos])
+    finally:
+        heartbeat.cancel()
+        if resume is not None and not resume.done():
+            # its jobs must stop before their leases are handed back
+            resume.cancel()
+            await asyncio.gather(resume, return_exceptions=True)
+        jobstore.release_all()
+        if _render_farm is not None:
+            _render_farm.shutdown()
+        # Only tear down what this run actually loaded (including overridden plugins)
+        await plugins.shutdown("uploaders")
+        await plugins.shutdown("providers")
+        if f"{__package__}.downloads" in sys.modules:
+            await sys.modules[f"{__package__}.downloads"].get_download_manager().aclose()
+        await close_http_client()
+        metrics.shutdown()
 
 if __name__ == "__main__":
     asyncio.run(main())
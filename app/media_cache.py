@@ -0,0 +1,185 @@
+import os, json, time, hashlib, sqlite3, threading
+from pathlib import Path
+from typing import Dict, Optional
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+class MediaStore:
+    """
+    Content-addressed store for downloaded stock media.
+    Objects live at <root>/objects/<aa>/<sha256><ext>; an SQLite index maps
+    source URLs to content hashes and records size, last access and the
+    query that fetched them. Files derived from an object (render proxies)
+    are indexed against it, count toward the same disk quota and are
+    removed with it. Least recently used objects are evicted once the store
+    exceeds its disk quota. Search results are cached per query for
+    `query_ttl` seconds.
+    """
+
+    def __init__(self, root: Path, quota_bytes: Optional[int] = None, query_ttl: Optional[int] = None):
+        self.root = Path(root)
+        self.quota_bytes = quota_bytes if quota_bytes is not None else int(os.getenv("MEDIA_CACHE_QUOTA_MB", "5120")) * 1024 * 1024
+        self.query_ttl = query_ttl if query_ttl is not None else int(os.getenv("MEDIA_QUERY_TTL_SECONDS", "86400"))
+        (self.root / "objects").mkdir(parents=True, exist_ok=True)
+        (self.root / "tmp").mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.root / "index.sqlite", check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+        CREATE TABLE IF NOT EXISTS objects (
+            sha256 TEXT PRIMARY KEY,
+            path TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            last_access REAL NOT NULL,
+            source_query TEXT
+        );
+        CREATE TABLE IF NOT EXISTS urls (
+            url_hash TEXT PRIMARY KEY,
+            url TEXT NOT NULL,
+            sha256 TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS queries (
+            query_key TEXT PRIMARY KEY,
+            result_json TEXT NOT NULL,
+            fetched_ts REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS derived (
+            path TEXT PRIMARY KEY,
+            sha256 TEXT NOT NULL,
+            size INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS objects_lru ON objects(last_access);
+        CREATE INDEX IF NOT EXISTS derived_sha ON derived(sha256);
+        """)
+        self._conn.commit()
+
+    # --- search results -------------------------------------------------
+
+    def get_query(self, key: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT result_json, fetched_ts FROM queries WHERE query_key=?", (key,)).fetchone()
+        if row is None or time.time() - row[1] > self.query_ttl:
+            return None
+        return json.loads(row[0])
+
+    def put_query(self, key: str, result: dict):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO queries (query_key, result_json, fetched_ts) VALUES (?, ?, ?)",
+                               (key, json.dumps(result), time.time()))
+
+    # --- objects --------------------------------------------------------
+
+    def tmp_path(self, url: str) -> Path:
+        # Partial downloads land here (stable per URL so they can be resumed)
+        # and are moved into place by put_file
+        return self.root / "tmp" / f"{_sha256(url.encode())}.part"
+
+    def lookup_url(self, url: str) -> Optional[Path]:
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT o.sha256, o.path FROM urls u JOIN objects o ON o.sha256 = u.sha256 WHERE u.url_hash=?",
+                (_sha256(url.encode()),),
+            ).fetchone()
+            if row is None:
+                return None
+            path = Path(row[1])
+            if not path.exists():
+                self._conn.execute("DELETE FROM objects WHERE sha256=?", (row[0],))
+                return None
+            self._conn.execute("UPDATE objects SET last_access=? WHERE sha256=?", (time.time(), row[0]))
+        return path
+
+    def put_file(self, url: str, src: Path, query: Optional[str] = None) -> Path:
+        """
+        Move a finished download into the store under its content hash.
+        Identical content fetched from different URLs is stored once.
+        """
+        digest = file_sha256(src)
+        ext = os.path.splitext(url.split("?")[0])[1].lower()
+        dest = self.root / "objects" / digest[:2] / f"{digest}{ext}"
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        if dest.exists():
+            src.unlink()
+        else:
+            os.replace(src, dest)  # atomic within one filesystem
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO objects (sha256, path, size, last_access, source_query) VALUES (?, ?, ?, ?, ?)",
+                (digest, str(dest), dest.stat().st_size, time.time(), query),
+            )
+            self._conn.execute("INSERT OR REPLACE INTO urls (url_hash, url, sha256) VALUES (?, ?, ?)",
+                               (_sha256(url.encode()), url, digest))
+        self.evict(keep=digest)
+        return dest
+
+    def put_derived(self, digest: str, path: Path):
+        # Index a file made from object `digest` (e.g. its proxy) so it shares the quota
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO derived (path, sha256, size) VALUES (?, ?, ?)",
+                               (str(path), digest, Path(path).stat().st_size))
+            self._conn.execute("UPDATE objects SET last_access=? WHERE sha256=?", (time.time(), digest))
+        self.evict(keep=digest)
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT (SELECT COALESCE(SUM(size), 0) FROM objects) + (SELECT COALESCE(SUM(size), 0) FROM derived)"
+            ).fetchone()[0]
+
+    def _remove_derived(self, digest: str) -> int:
+        freed = 0
+        for path, size in self._conn.execute("SELECT path, size FROM derived WHERE sha256=?", (digest,)).fetchall():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            freed += size
+        self._conn.execute("DELETE FROM derived WHERE sha256=?", (digest,))
+        return freed
+
+    def evict(self, keep: Optional[str] = None):
+        total = self.total_bytes()
+        if total <= self.quota_bytes:
+            return
+        with self._lock, self._conn:
+            # derived files whose source object is gone go first, oldest sources next
+            orphans = self._conn.execute(
+                "SELECT DISTINCT sha256 FROM derived WHERE sha256 NOT IN (SELECT sha256 FROM objects)"
+            ).fetchall()
+            for (digest,) in orphans:
+                if total <= self.quota_bytes:
+                    break
+                if digest != keep:
+                    total -= self._remove_derived(digest)
+            for digest, path, size in self._conn.execute(
+                "SELECT sha256, path, size FROM objects ORDER BY last_access ASC"
+            ).fetchall():
+                if total <= self.quota_bytes:
+                    break
+                if digest == keep:
+                    continue
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                self._conn.execute("DELETE FROM objects WHERE sha256=?", (digest,))
+                self._conn.execute("DELETE FROM urls WHERE sha256=?", (digest,))
+                total -= size + self._remove_derived(digest)
+
+_stores: Dict[str, MediaStore] = {}
+_stores_lock = threading.Lock()
+
+def get_store(root: Path) -> MediaStore:
+    key = str(Path(root).resolve())
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = MediaStore(Path(root))
+        return _stores[key]
@@ -0,0 +1,210 @@
+import os, json, time, uuid, bisect, asyncio, threading, contextvars
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Lightweight tracing/metrics, stdlib only. Every instrumented call runs in a
+# span(); a span feeds three Prometheus-style series (duration histogram,
+# error counter, bytes/cache counters) and appends one JSON line to the trace
+# log. Spans opened while a job is running carry its trace id, so one video's
+# LLM/TTS/media/render/upload timings can be pulled out of the log together.
+#
+#   METRICS_PORT=9464            serve /metrics (0 = off)
+#   METRICS_TRACE_FILE=...       JSON-lines trace log ("" = off)
+#   METRICS_TRACE_MAX_MB=100     rotate the trace log to <file>.1 past this size
+
+PREFIX = "socaut"
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+_lock = threading.Lock()
+_counters: Dict[str, Dict[LabelKey, float]] = defaultdict(lambda: defaultdict(float))
+_hists: Dict[str, Dict[LabelKey, List[float]]] = defaultdict(dict)  # per label set, layout in observe()
+_help: Dict[str, Tuple[str, str]] = {}
+
+_trace_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("trace_id", default=None)
+_parent: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("span_parent", default=None)
+_trace_fh = None
+_trace_path: Optional[Path] = None
+
+def _key(labels: dict) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def inc(name: str, value: float = 1.0, help: str = "", **labels):
+    with _lock:
+        _help.setdefault(name, ("counter", help))
+        _counters[name][_key(labels)] += value
+
+def observe(name: str, value: float, help: str = "", **labels):
+    with _lock:
+        _help.setdefault(name, ("histogram", help))
+        # layout: [per-bucket counts..., +Inf count, sum]
+        h = _hists[name].setdefault(_key(labels), [0.0] * (len(BUCKETS) + 2))
+        h[bisect.bisect_left(BUCKETS, value)] += 1  # last bucket slot is +Inf
+        h[-1] += value
+
+def set_trace(trace_id: Optional[str] = None) -> str:
+    # Called per job (trace id = job id); spans in tasks spawned after this inherit it
+    trace_id = trace_id or uuid.uuid4().hex[:16]
+    _trace_id.set(trace_id)
+    return trace_id
+
+def _trace_file():
+    global _trace_fh, _trace_path
+    if _trace_fh is None:
+        path = os.getenv("METRICS_TRACE_FILE", str(Path(os.getenv("OUTPUT_DIR", "output")) / "traces.jsonl"))
+        if not path:
+            return None
+        _trace_path = Path(path)
+        _trace_path.parent.mkdir(parents=True, exist_ok=True)
+        _trace_fh = open(_trace_path, "a", buffering=1, encoding="utf-8")
+    return _trace_fh
+
+def _rotate():
+    # Keep one previous file, so the log never holds more than twice the cap
+    global _trace_fh
+    _trace_fh.close()
+    os.replace(_trace_path, _trace_path.with_name(_trace_path.name + ".1"))
+    _trace_fh = open(_trace_path, "a", buffering=1, encoding="utf-8")
+
+def _emit(record: dict):
+    try:
+        line = json.dumps(record, default=str)
+        max_bytes = float(os.getenv("METRICS_TRACE_MAX_MB", "100")) * 1024 * 1024
+        with _lock:
+            fh = _trace_file()
+            if fh is not None:
+                fh.write(line + "\n")
+                if max_bytes and fh.tell() > max_bytes:
+                    _rotate()
+    except Exception as e:
+        print("[WARN] Could not write trace:", e)
+
+class span:
+    """
+    Time a block (sync or async): `with span("tts", source=...) as sp:`.
+    Keyword labels become metric labels, so keep them low-cardinality;
+    sp.set(...) adds trace-only attributes, except `bytes` and `cache_hit`
+    which also feed the bytes and cache counters.
+    """
+
+    def __init__(self, name: str, **labels):
+        self.name = name
+        self.labels = labels
+        self.attrs: dict = {}
+        self.span_id = uuid.uuid4().hex[:16]
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+        return self
+
+    def __enter__(self):
+        self._parent = _parent.get()
+        self._token = _parent.set(self.span_id)
+        self._wall = time.time()
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        dur = time.perf_counter() - self._t0
+        _parent.reset(self._token)
+        labels = dict(self.labels, stage=self.name)
+        observe(f"{PREFIX}_stage_duration_seconds", dur, "Wall time per instrumented call", **labels)
+        if exc_type is not None and not issubclass(exc_type, (asyncio.CancelledError, GeneratorExit)):
+            inc(f"{PREFIX}_stage_errors_total", 1, "Instrumented calls that raised", **labels)
+        if self.attrs.get("bytes"):
+            inc(f"{PREFIX}_bytes_total", self.attrs["bytes"], "Bytes downloaded, synthesized, rendered or uploaded", **labels)
+        if "cache_hit" in self.attrs:
+            inc(f"{PREFIX}_cache_total", 1, "Cache lookups by result",
+                result="hit" if self.attrs["cache_hit"] else "miss", **labels)
+        _emit({
+            "ts": self._wall, "trace": _trace_id.get(), "span": self.span_id, "parent": self._parent,
+            "name": self.name, "duration_s": round(dur, 6), "labels": self.labels, "attrs": self.attrs,
+            "error": repr(exc) if exc is not None else None,
+        })
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+def file_size(path) -> int:
+    try:
+        return os.path.getsize(path)
+    except (OSError, TypeError):
+        return 0
+
+# --- export -------------------------------------------------------------
+
+def _fmt_labels(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    items = key + extra
+    if not items:
+        return ""
+    esc = lambda v: v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items) + "}"
+
+def render_prometheus() -> str:
+    """Current counters and histograms in the Prometheus text format."""
+    lines = []
+    with _lock:
+        for name, series in sorted(_counters.items()):
+            lines.append(f"# HELP {name} {_help[name][1]}")
+            lines.append(f"# TYPE {name} counter")
+            for key, v in series.items():
+                lines.append(f"{name}{_fmt_labels(key)} {v:g}")
+        for name, series in sorted(_hists.items()):
+            lines.append(f"# HELP {name} {_help[name][1]}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, h in series.items():
+                cum = 0.0
+                for le, n in zip(BUCKETS + (float("inf"),), h[:-1]):
+                    cum += n
+                    lines.append(f"{name}_bucket{_fmt_labels(key, (('le', '+Inf' if le == float('inf') else f'{le:g}'),))} {cum:g}")
+                lines.append(f"{name}_sum{_fmt_labels(key)} {h[-1]:.6f}")
+                lines.append(f"{name}_count{_fmt_labels(key)} {cum:g}")
+    return "\n".join(lines) + "\n"
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+_server: Optional[ThreadingHTTPServer] = None
+
+def start_metrics_server(port: Optional[int] = None) -> Optional[int]:
+    """Serve /metrics on METRICS_PORT from a daemon thread; returns the bound port."""
+    global _server
+    port = port if port is not None else int(os.getenv("METRICS_PORT", "0"))
+    if _server is not None:
+        return _server.server_address[1]
+    if port <= 0:
+        return None
+    _server = ThreadingHTTPServer((os.getenv("METRICS_HOST", "127.0.0.1"), port), _Handler)
+    threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+    print(f"[INFO] Metrics on http://{_server.server_address[0]}:{_server.server_address[1]}/metrics")
+    return _server.server_address[1]
+
+def shutdown():
+    global _server, _trace_fh, _trace_path
+    if _server is not None:
+        _server.shutdown()
+        _server = None
+    if _trace_fh is not None:
+        _trace_fh.close()
+        _trace_fh = None
+        _trace_path = None
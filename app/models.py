@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, HttpUrl
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from datetime import datetime
 
 class Article(BaseModel):
@@ -20,10 +20,30 @@ class Script(BaseModel):
 
 class VideoJob(BaseModel):
     article: Article
-    script: Script
+    script: Optional[Script] = None
     voice_id: str
     bgm_path: Optional[str] = None
     hashtags: List[str] = Field(default_factory=list)
     output_video_path: Optional[str] = None
     upload_youtube: bool = True
     upload_tiktok: bool = False
+    # Stage artifacts, checkpointed as the job moves through the pipeline
+    audio_path: Optional[str] = None
+    img_paths: List[str] = Field(default_factory=list)
+    vid_paths: List[str] = Field(default_factory=list)
+    captions: Optional[List[Tuple[str, float, float]]] = None
+    youtube_id: Optional[str] = None
+    tiktok_posted: bool = False
+
+class RenderSpec(BaseModel):
+    # Serializable input for compose_video, shipped to render worker processes
+    audio_path: str
+    img_paths: List[str] = Field(default_factory=list)
+    vid_paths: List[str] = Field(default_factory=list)
+    captions: List[Tuple[str, float, float]] = Field(default_factory=list)
+    brand_handle: str
+    bgm_path: Optional[str] = None
+    out_path: str
+    threads: int = 2
+    engine: str = "moviepy"  # or "ffmpeg" (single filter-graph invocation)
+    profile: List[str] = Field(default_factory=list)  # app.profiling modes for this job
@@ -0,0 +1,103 @@
+import asyncio, os
+from typing import Any, AsyncIterable, Awaitable, Callable, Iterable, List, Optional, Union
+
+_DONE = object()
+
+def stage_limit(name: str, default: int) -> int:
+    # e.g. PIPELINE_RENDER_CONCURRENCY=2
+    return max(1, int(os.getenv(f"PIPELINE_{name.upper()}_CONCURRENCY", default)))
+
+class Stage:
+    def __init__(self, name: str, fn: Callable[[Any], Awaitable[Any]], concurrency: int = 1):
+        self.name = name
+        self.fn = fn
+        self.concurrency = max(1, concurrency)
+
+class Pipeline:
+    """
+    Chain of async stages connected by bounded queues.
+    Every stage runs its own pool of workers, so article N+1 can be in the
+    network-bound stages (LLM, TTS, media) while article N is still rendering.
+    A stage returning None (or raising) drops the item from the pipeline.
+    """
+
+    def __init__(self, stages: List[Stage], queue_size: Optional[int] = None):
+        self.stages = stages
+        self.queue_size = queue_size or int(os.getenv("PIPELINE_QUEUE_SIZE", "2"))
+        self.queues: List[asyncio.Queue] = []
+        self._on_drop: Optional[Callable[[Any], Any]] = None
+
+    def depth(self) -> int:
+        # Items waiting between stages (used for backpressure by the poller)
+        return sum(q.qsize() for q in self.queues[:-1])
+
+    async def _worker(self, stage: Stage, inq: asyncio.Queue, outq: asyncio.Queue):
+        while True:
+            item = await inq.get()
+            if item is _DONE:
+                await inq.put(_DONE)  # let sibling workers see it too
+                return
+            try:
+                out = await stage.fn(item)
+            except Exception as e:
+                print(f"[WARN] Stage {stage.name} failed: {e}")
+                out = None
+            if out is not None:
+                await outq.put(out)
+            elif self._on_drop is not None:
+                self._on_drop(item)
+
+    async def _run_stage(self, stage: Stage, inq: asyncio.Queue, outq: asyncio.Queue):
+        await asyncio.gather(*[self._worker(stage, inq, outq) for _ in range(stage.concurrency)])
+        await outq.put(_DONE)
+
+    async def _drain(self, q: asyncio.Queue, on_result: Callable[[Any], Any]):
+        while True:
+            item = await q.get()
+            if item is _DONE:
+                return
+            try:
+                out = on_result(item)
+                if asyncio.iscoroutine(out):
+                    await out
+            except Exception as e:
+                print(f"[WARN] Pipeline result handler failed: {e}")
+
+    async def run(self, items: Union[Iterable[Any], AsyncIterable[Any]],
+                  on_result: Optional[Callable[[Any], Any]] = None,
+                  on_drop: Optional[Callable[[Any], None]] = None) -> List[Any]:
+        """
+        Push items through every stage and return the ones that made it out
+        of the last stage (in completion order). `items` may be an async
+        iterator; it is only advanced when the first stage has room.
+        With `on_result` (plain or async), finished items are handed to it as
+        they arrive and not kept, so an endless `items` stream runs in
+        constant memory; the return value is then empty. `on_drop(item)` is
+        called with the input of a stage that failed or returned None.
+        """
+        self._on_drop = on_drop
+        self.queues = [asyncio.Queue(maxsize=self.queue_size) for _ in self.stages] + [asyncio.Queue()]
+        runners = [
+            asyncio.create_task(self._run_stage(s, self.queues[i], self.queues[i + 1]))
+            for i, s in enumerate(self.stages)
+        ]
+        if on_result is not None:
+            runners.append(asyncio.create_task(self._drain(self.queues[-1], on_result)))
+        if hasattr(items, "__aiter__"):
+            async for item in items:
+                await self.queues[0].put(item)
+        else:
+            for item in items:
+                await self.queues[0].put(item)
+        await self.queues[0].put(_DONE)
+        await asyncio.gather(*runners)
+        if on_result is not None:
+            return []
+
+        results = []
+        while True:
+            item = self.queues[-1].get_nowait()
+            if item is _DONE:
+                break
+            results.append(item)
+        return results
@@ -0,0 +1,101 @@
+import sys, asyncio, importlib
+from typing import Any, Dict
+
+# Registry of pluggable parts. Entries are "module" or "module:attribute"
+# strings (relative to this package if they start with "."), imported the
+# first time they are asked for, so a poll-only run never pays for the LLM,
+# TTS, render or upload stacks.
+#
+# feeds.yaml can add or override entries, and a feed's `type` may name a
+# class directly:
+#
+#   plugins:
+#     sources:   {hackernews: "mypkg.hn:HackerNewsSource"}
+#     providers: {media: "mypkg.media:search"}
+#   feeds:
+#     - type: reddit
+#     - type: "mypkg.rss:RSSSource"
+#
+# A plugin module may define `shutdown()` (plain or async); shutdown() below
+# calls it at exit, but only for plugins this run actually imported.
+
+DEFAULTS: Dict[str, Dict[str, str]] = {
+    "sources": {
+        "newsapi": ".sources.newsapi:NewsAPISource",
+        "reddit": ".sources.reddit:RedditSource",
+        "generic_json": ".sources.generic_json:GenericJSONSource",
+    },
+    "providers": {
+        "script": ".llm",                         # generate_script, generate_scripts_batch, stream_script
+        "tts": ".tts",                            # synthesize_elevenlabs, synthesize_chunked
+        "media": ".stock_media:pixabay_search",
+        "captions": ".captions",                  # whisper_segments, naive_segments
+    },
+    "uploaders": {
+        "youtube": ".upload.youtube:get_youtube_uploader",
+        "tiktok": ".upload.tiktok:get_tiktok_uploader",
+    },
+}
+
+_registry: Dict[str, Dict[str, str]] = {kind: dict(refs) for kind, refs in DEFAULTS.items()}
+_resolved: Dict[str, Any] = {}
+
+def register(kind: str, name: str, ref: str):
+    _registry.setdefault(kind, {})[name] = ref
+
+def configure(cfg: dict):
+    # Apply the `plugins:` section of feeds.yaml
+    for kind, refs in (cfg.get("plugins") or {}).items():
+        for name, ref in (refs or {}).items():
+            register(kind, name, ref)
+
+def _module_name(ref: str) -> str:
+    mod = ref.partition(":")[0]
+    return f"{__package__}{mod}" if mod.startswith(".") else mod
+
+def resolve(ref: str) -> Any:
+    obj = _resolved.get(ref)
+    if obj is None:
+        obj = importlib.import_module(_module_name(ref))
+        for part in filter(None, ref.partition(":")[2].split(".")):
+            obj = getattr(obj, part)
+        _resolved[ref] = obj
+    return obj
+
+def get(kind: str, name: str) -> Any:
+    ref = _registry.get(kind, {}).get(name)
+    if ref is None and ":" in name:
+        ref = name  # direct "module:Class" reference
+    if ref is None:
+        raise KeyError(f"Unknown {kind} plugin '{name}' (known: {', '.join(sorted(_registry.get(kind, {})))})")
+    return resolve(ref)
+
+def provider(name: str) -> Any:
+    return get("providers", name)
+
+def uploader(name: str) -> Any:
+    return get("uploaders", name)
+
+def names(kind: str):
+    return list(_registry.get(kind, {}))
+
+def loaded(kind: str, name: str) -> bool:
+    # True once the plugin's module has been imported (e.g. to skip shutdown hooks)
+    ref = _registry.get(kind, {}).get(name)
+    return ref is not None and _module_name(ref) in sys.modules
+
+async def shutdown(kind: str):
+    # Run the shutdown hook of every loaded `kind` plugin (blocking hooks in a thread)
+    for name in names(kind):
+        if not loaded(kind, name):
+            continue
+        hook = getattr(sys.modules[_module_name(_registry[kind][name])], "shutdown", None)
+        if hook is None:
+            continue
+        try:
+            if asyncio.iscoroutinefunction(hook):
+                await hook()
+            else:
+                await asyncio.to_thread(hook)
+        except Exception as e:
+            print(f"[WARN] Shutdown of {kind} plugin '{name}' failed: {e}")
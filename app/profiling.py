@@ -0,0 +1,173 @@
+import os, sys, time, random, threading, tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# On-demand profiling of render jobs, cheap enough to leave on in production
+# because only 1 in PROFILE_SAMPLE_RATE jobs is profiled.
+#
+#   PROFILE_MODE=cpu,mem,frames   any subset ("" = off)
+#   PROFILE_SAMPLE_RATE=20        profile one job in 20
+#   PROFILE_INTERVAL_MS=5         CPU sampling interval
+#
+# Output goes next to the rendered video as folded stacks ("a;b;c 42" per
+# line), readable by flamegraph.pl, speedscope and inferno:
+#   <video>.cpu.folded     stack samples of the render thread
+#   <video>.mem.folded     live allocations (bytes) at the end of the render
+#   <video>.frames.folded  microseconds per moviepy layer's make_frame
+#   <video>.frames.csv     per-frame make_frame time
+
+MODES = ("cpu", "mem", "frames")
+
+def modes_for_job() -> List[str]:
+    """Profiling modes for the next render job (empty = not sampled)."""
+    modes = [m.strip() for m in os.getenv("PROFILE_MODE", "").split(",") if m.strip()]
+    unknown = [m for m in modes if m not in MODES]
+    if unknown:
+        print(f"[WARN] Ignoring unknown PROFILE_MODE entries: {unknown}")
+        modes = [m for m in modes if m in MODES]
+    rate = max(1, int(os.getenv("PROFILE_SAMPLE_RATE", "1")))
+    if not modes or random.random() >= 1.0 / rate:
+        return []
+    return modes
+
+def _frame_name(code) -> str:
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+def _write_folded(path: Path, stacks: Dict[str, float]):
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, value in sorted(stacks.items(), key=lambda kv: -kv[1]):
+            if value >= 1:
+                f.write(f"{stack} {int(value)}\n")
+
+class _Sampler(threading.Thread):
+    # Samples one thread's Python stack at a fixed interval
+    def __init__(self, target_ident: int, interval: float):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.target = target_ident
+        self.interval = interval
+        self.counts: Dict[str, float] = defaultdict(float)
+        self._stop_evt = threading.Event()
+
+    def run(self):
+        while not self._stop_evt.wait(self.interval):
+            frame = sys._current_frames().get(self.target)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_evt.set()
+        self.join()
+
+class FrameTimer:
+    """
+    Times moviepy's make_frame chain: the composite's own blending plus each
+    named group of layers it pulls frames from.
+    """
+
+    def __init__(self):
+        self.layer_s: Dict[str, float] = defaultdict(float)
+        self.frames: List[tuple] = []  # (t, seconds)
+
+    def _wrap(self, clip, name: str):
+        inner = clip.make_frame
+        def make_frame(t):
+            t0 = time.perf_counter()
+            try:
+                return inner(t)
+            finally:
+                self.layer_s[name] += time.perf_counter() - t0
+        clip.make_frame = make_frame
+
+    def attach(self, composite, layers: Dict[str, list]):
+        for name, clips in layers.items():
+            for clip in clips:
+                self._wrap(clip, name)
+        inner = composite.make_frame
+        def make_frame(t):
+            t0 = time.perf_counter()
+            try:
+                return inner(t)
+            finally:
+                self.frames.append((t, time.perf_counter() - t0))
+        composite.make_frame = make_frame
+
+    def write(self, out_path: Path):
+        total = sum(d for _, d in self.frames)
+        stacks = {f"make_frame;{name}": s * 1e6 for name, s in self.layer_s.items()}
+        stacks["make_frame;composite"] = max(0.0, total - sum(self.layer_s.values())) * 1e6
+        _write_folded(out_path.with_suffix(".frames.folded"), stacks)
+        with open(out_path.with_suffix(".frames.csv"), "w", encoding="utf-8") as f:
+            f.write("frame,t,ms\n")
+            for i, (t, d) in enumerate(self.frames):
+                f.write(f"{i},{t:.4f},{d * 1000:.3f}\n")
+        if self.frames:
+            ms = sorted(d * 1000 for _, d in self.frames)
+            print(f"[INFO] make_frame: {len(ms)} frames, p50 {ms[len(ms) // 2]:.1f}ms, max {ms[-1]:.1f}ms")
+
+class Session:
+    def __init__(self, modes: List[str], out_path: Path):
+        self.modes = set(modes)
+        self.out_path = out_path
+        self.frame_timer = FrameTimer() if "frames" in self.modes else None
+        self._sampler: Optional[_Sampler] = None
+
+    def start(self):
+        if "mem" in self.modes and not tracemalloc.is_tracing():
+            tracemalloc.start(int(os.getenv("PROFILE_MEM_FRAMES", "16")))
+        if "cpu" in self.modes:
+            interval = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+            self._sampler = _Sampler(threading.get_ident(), interval)
+            self._sampler.start()
+
+    def stop(self):
+        self.out_path.parent.mkdir(parents=True, exist_ok=True)
+        if self._sampler is not None:
+            self._sampler.stop()
+            _write_folded(self.out_path.with_suffix(".cpu.folded"), self._sampler.counts)
+        if "mem" in self.modes and tracemalloc.is_tracing():
+            _, peak = tracemalloc.get_traced_memory()
+            snap = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+            ])
+            tracemalloc.stop()
+            stacks: Dict[str, float] = defaultdict(float)
+            for stat in snap.statistics("traceback"):
+                # frames come oldest first, as folded stacks expect
+                stacks[";".join(f"{Path(fr.filename).name}:{fr.lineno}" for fr in stat.traceback)] += stat.size
+            _write_folded(self.out_path.with_suffix(".mem.folded"), stacks)
+            print(f"[INFO] Render peak traced memory {peak / 1e6:.1f} MB")
+        if self.frame_timer is not None:
+            self.frame_timer.write(self.out_path)
+
+_active: Optional[Session] = None
+
+@contextmanager
+def profile(modes: List[str], out_path: Path):
+    """Profile the enclosed block (on the current thread) with `modes`."""
+    global _active
+    if not modes:
+        yield None
+        return
+    session = _active = Session(modes, out_path)
+    session.start()
+    try:
+        yield session
+    finally:
+        _active = None
+        try:
+            session.stop()
+            print(f"[INFO] Profile ({', '.join(sorted(session.modes))}) written next to {out_path}")
+        except Exception as e:
+            print("[WARN] Could not write profile:", e)
+
+def time_frames(composite, layers: Dict[str, list]):
+    # No-op unless the current render is sampled with the "frames" mode
+    if _active is not None and _active.frame_timer is not None:
+        _active.frame_timer.attach(composite, layers)
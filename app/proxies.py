@@ -0,0 +1,69 @@
+import os, re, subprocess, uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List
+from .media_cache import MediaStore, file_sha256
+
+# Ingest step for stock media: every downloaded clip/image is normalized once
+# into a 1080x1920 mezzanine (30 fps, keyframe every 0.5s for cheap seeks),
+# keyed by the source content hash, so renders only concat/seek into them.
+# Proxies live in <store>/proxies and are indexed as derived files of their
+# source object, so they count toward the store quota and go when it goes.
+
+W, H = 1080, 1920
+FPS = 30
+FFMPEG = os.getenv("FFMPEG_BINARY", "ffmpeg")
+VIDEO_EXTS = (".mp4",".mov",".webm",".mkv",".avi")
+_SHA_RE = re.compile(r"^[0-9a-f]{64}$")
+
+def _fill_filter() -> str:
+    # Same framing as video._fit_clip_to_vertical: center-crop to 9:16, then scale
+    return f"scale={W}:{H}:force_original_aspect_ratio=increase,crop={W}:{H},setsar=1"
+
+def ensure_proxy(src: Path, store: MediaStore) -> Path:
+    src = Path(src)
+    proxy_dir = store.root / "proxies"
+    is_video = src.suffix.lower() in VIDEO_EXTS
+    # Store objects are already named by content hash
+    digest = src.stem if _SHA_RE.match(src.stem) else file_sha256(src)
+    dest = proxy_dir / (f"{digest}.mp4" if is_video else f"{digest}.png")
+    if dest.exists():
+        store.put_derived(digest, dest)  # refresh the source's last access
+        return dest
+    proxy_dir.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(f".{uuid.uuid4().hex}{dest.suffix}")
+    if is_video:
+        max_s = os.getenv("PROXY_MAX_SECONDS", "60")
+        cmd = [FFMPEG, "-y", "-hide_banner", "-loglevel", "error", "-i", str(src), "-t", max_s,
+               "-vf", f"{_fill_filter()},fps={FPS}", "-an",
+               "-c:v", "libx264", "-preset", "veryfast", "-crf", "18", "-pix_fmt", "yuv420p",
+               "-g", str(FPS // 2), "-keyint_min", str(FPS // 2), "-sc_threshold", "0",
+               "-movflags", "+faststart", str(tmp)]
+    else:
+        cmd = [FFMPEG, "-y", "-hide_banner", "-loglevel", "error", "-i", str(src),
+               "-vf", _fill_filter(), "-frames:v", "1", str(tmp)]
+    try:
+        subprocess.run(cmd, capture_output=True, check=True)
+        os.replace(tmp, dest)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    store.put_derived(digest, dest)
+    return dest
+
+def ensure_proxies(paths: List[Path], store: MediaStore) -> List[Path]:
+    """
+    Proxy every path in parallel (ffmpeg runs out of process). A source that
+    fails to transcode is passed through unchanged, so the render falls
+    back to scaling it per frame.
+    """
+    def one(p):
+        try:
+            return ensure_proxy(p, store)
+        except Exception as e:
+            print(f"[WARN] Proxy for {p} failed: {e}")
+            return Path(p)
+    if not paths:
+        return []
+    with ThreadPoolExecutor(max_workers=int(os.getenv("PROXY_WORKERS", "2"))) as ex:
+        return list(ex.map(one, paths))
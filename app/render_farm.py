@@ -0,0 +1,123 @@
+import asyncio, os, signal, sys
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Optional
+from .models import RenderSpec
+from . import profiling
+
+class RenderError(RuntimeError):
+    def __init__(self, spec: RenderSpec, reason: str):
+        super().__init__(f"Render of {spec.out_path} failed: {reason}")
+        self.spec = spec
+        self.reason = reason
+
+class RenderTimeout(Exception):
+    # Raised inside the worker by SIGALRM; not a TimeoutError, so it can never
+    # be mistaken for the parent's own hard timeout
+    pass
+
+def _on_alarm(signum, frame):
+    raise RenderTimeout("render timed out")
+
+def _render_job(spec: dict, timeout: int) -> str:
+    # Runs inside a worker process; tasks execute on the worker's main thread,
+    # so SIGALRM can interrupt a render that runs past its budget.
+    s = RenderSpec(**spec)
+    if s.engine == "ffmpeg":
+        from .video_ffmpeg import compose_video_ffmpeg as compose_video
+    else:
+        from .video import compose_video
+    if timeout:
+        signal.signal(signal.SIGALRM, _on_alarm)
+        signal.alarm(timeout)
+    try:
+        with profiling.profile(s.profile, Path(s.out_path)):
+            out = compose_video(
+                Path(s.audio_path),
+                [Path(p) for p in s.img_paths],
+                [Path(p) for p in s.vid_paths],
+                [tuple(c) for c in s.captions],
+                s.brand_handle,
+                s.bgm_path,
+                Path(s.out_path),
+                threads=s.threads,
+            )
+    finally:
+        if timeout:
+            signal.alarm(0)
+    return str(out)
+
+class RenderFarm:
+    """
+    Pool of render worker processes fed with RenderSpec jobs.
+    Workers are recycled after `max_jobs_per_worker` renders to cap the memory
+    moviepy/ffmpeg leak over time. A job that overruns its timeout is stopped
+    in the worker; if the worker is wedged beyond that, the pool is rebuilt.
+    """
+
+    def __init__(self, workers: Optional[int] = None, timeout: Optional[int] = None,
+                 max_jobs_per_worker: Optional[int] = None):
+        self.workers = workers or int(os.getenv("RENDER_WORKERS", os.cpu_count() or 1))
+        self.timeout = timeout if timeout is not None else int(os.getenv("RENDER_TIMEOUT_SECONDS", "900"))
+        self.max_jobs_per_worker = max_jobs_per_worker or int(os.getenv("RENDER_MAX_JOBS_PER_WORKER", "20"))
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # max_tasks_per_child needs Python >= 3.11 and a non-fork start method
+            kw = {}
+            if sys.version_info >= (3, 11):
+                kw["max_tasks_per_child"] = self.max_jobs_per_worker
+            else:
+                print("[WARN] Python < 3.11: render workers are not recycled")
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=mp.get_context("spawn"),
+                **kw,
+            )
+        return self._pool
+
+    def _reset(self, pool: ProcessPoolExecutor):
+        # Only tear down `pool` if it is still the live one: the other renders
+        # it broke call this too, and must not kill its replacement
+        if pool is None or self._pool is not pool:
+            return
+        self._pool = None
+        if hasattr(pool, "terminate_workers"):  # Python >= 3.14
+            pool.terminate_workers()
+        else:
+            # The render pool is the only multiprocessing user in this process,
+            # and its replacement is not started until after this returns
+            for p in mp.active_children():
+                p.terminate()
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    async def render(self, spec: RenderSpec) -> Path:
+        pool = self._get_pool()
+        # Grace period on top of the in-worker alarm before we give up on the process
+        hard_timeout = self.timeout + 60 if self.timeout else None
+        try:
+            fut = asyncio.wrap_future(pool.submit(_render_job, spec.model_dump(), self.timeout))
+            done, _ = await asyncio.wait({fut}, timeout=hard_timeout)
+            if not done:
+                # Only a wedged worker gets here; the pool is rebuilt to get rid of it
+                fut.cancel()
+                self._reset(pool)
+                raise RenderError(spec, f"worker unresponsive after {hard_timeout}s")
+            return Path(fut.result())
+        except RenderError:
+            raise
+        except RenderTimeout:
+            raise RenderError(spec, f"timed out after {self.timeout}s")
+        except BrokenProcessPool as e:
+            self._reset(pool)
+            raise RenderError(spec, f"worker process died ({e})")
+        except Exception as e:
+            raise RenderError(spec, str(e)) from e
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
@@ -1,56 +1,192 @@
-import asyncio, yaml
+import asyncio, os, yaml, heapq, itertools, random
 from pathlib import Path
-from typing import List, Callable
-from .sources.newsapi import NewsAPISource
-from .db import init_db, already_seen, mark_seen
+from typing import Awaitable, Callable, List, Optional, Tuple
+from .db import init_db, filter_unseen, mark_seen_many
 from .models import Article
+from .dedup import get_near_dup_index
+from . import metrics, plugins
 
 def build_sources(config_path: Path):
     """
-    Build only NewsAPI sources from config.yaml.
+    Build sources from feeds.yaml. A feed's `type` names a source plugin
+    (newsapi, reddit, generic_json, or anything registered under
+    `plugins.sources`); its class is imported only if a feed uses it.
     NewsAPISource is special: it always produces 6 articles (2 per feed type).
     """
     cfg = yaml.safe_load(open(config_path, "r", encoding="utf-8"))
+    plugins.configure(cfg)
     feeds = cfg.get("feeds", [])
     sources = []
     for f in feeds:
         if not f.get("enabled", True):
             continue
-        if f.get("type") == "newsapi":
-            name = f.get("name", "newsapi")
-            sources.append(NewsAPISource(name))
+        kind = f.get("type", "newsapi")
+        try:
+            cls = plugins.get("sources", kind)
+        except (KeyError, ImportError, AttributeError) as e:
+            print(f"[WARN] Skipping feed {f.get('name', kind)}: {e}")
+            continue
+        src = cls(f.get("name", kind), f.get("params") or {})
+        src.poll_interval = f.get("poll_interval_seconds")
+        sources.append(src)
     return sources, cfg.get("poll_interval_seconds", 300)
 
+async def _fetch_source(s) -> Optional[List[Article]]:
+    # Each source gets its own deadline so a slow or failing one cannot hold up the rest.
+    # Returns None on failure so callers can tell "nothing new" from "error".
+    timeout = float(os.getenv("SOURCE_TIMEOUT_SECONDS", "45"))
+    try:
+        async with metrics.span("poll", source=getattr(s, 'name', '?')) as sp:
+            arts = await asyncio.wait_for(s.fetch(), timeout)
+            sp.set(articles=len(arts))
+            return arts
+    except asyncio.TimeoutError:
+        print(f"[WARN] Source {getattr(s, 'name', '?')} timed out after {timeout}s")
+    except Exception as e:
+        print(f"[WARN] Source {getattr(s, 'name', '?')} failed: {e}")
+    # nothing was recorded, so the next poll must ask again from the old state
+    if hasattr(s, "discard_state"):
+        s.discard_state()
+    return None
+
+def _commit_state(sources):
+    # Validators/cursors only move forward once their articles are marked seen
+    for s in sources:
+        if hasattr(s, "commit_state"):
+            try:
+                s.commit_state()
+            except Exception as e:
+                print(f"[WARN] Could not save state of source {getattr(s, 'name', '?')}: {e}")
+
+def _filter_new(fetched: List[Article]) -> List[Article]:
+    # keep the first occurrence of each key within this batch
+    by_key = {}
+    for a in fetched:
+        by_key.setdefault((a.source, a.external_id), a)
+    all_new = [by_key[k] for k in filter_unseen(list(by_key))]
+    mark_seen_many([(a.source, a.external_id, a.title) for a in all_new])
+    if os.getenv("NEAR_DUP_FILTER","1") != "1":
+        return all_new
+    # Same story under a different URL/source: drop before it costs LLM/TTS/render
+    fresh, dups = get_near_dup_index().check_and_add(all_new)
+    for a, original in dups:
+        print(f"[INFO] Skipping near-duplicate '{a.title[:60]}' ({a.source}) of {original}")
+    return fresh
+
 async def poll_once(sources: List) -> List[Article]:
     """
-    Fetch new articles from all sources and filter out already-seen ones.
+    Fetch new articles from all sources concurrently and filter out
+    already-seen ones. Poll latency is the slowest source, and the whole
+    batch is checked and recorded with O(1) DB round-trips.
     """
-    all_new: List[Article] = []
-    for s in sources:
-        try:
-            arts = await s.fetch()
-            for a in arts:
-                if not already_seen(a.source, a.external_id):
-                    mark_seen(a.source, a.external_id, a.title)
-                    all_new.append(a)
-        except Exception as e:
-            print(f"[WARN] Source {getattr(s, 'name', '?')} failed: {e}")
-    return all_new
-
-async def run_poll_loop(config_path: Path, on_articles: Callable[[List[Article]], None]):
-    """
-    Initialize DB, build sources, and poll them at interval forever.
+    fetched: List[Article] = []
+    async with metrics.span("poll_once") as sp:
+        results = await asyncio.gather(*[_fetch_source(s) for s in sources])
+        for arts in results:
+            fetched.extend(arts or [])
+        new = _filter_new(fetched)
+        _commit_state([s for s, arts in zip(sources, results) if arts is not None])
+        sp.set(sources=len(sources), fetched=len(fetched), new=len(new))
+        return new
+
+class SourceTimer:
+    """
+    Polling cadence of one source. The interval shrinks while the source
+    keeps yielding new items and stretches while it is quiet; failures back
+    off exponentially. Every delay gets +/- `jitter` randomization.
+    """
+
+    def __init__(self, source, interval: float, min_interval: float, max_interval: float, jitter: float = 0.1):
+        self.source = source
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.jitter = jitter
+        self.failures = 0
+        self.next_due = 0.0
+
+    def on_result(self, n_new: int):
+        self.failures = 0
+        factor = 0.7 if n_new > 0 else 1.3
+        self.interval = min(self.max_interval, max(self.min_interval, self.interval * factor))
+
+    def on_error(self):
+        self.failures += 1
+
+    def delay(self) -> float:
+        base = self.interval
+        if self.failures:
+            base = min(self.max_interval, self.interval * (2 ** self.failures))
+        return base * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+class AdaptiveScheduler:
+    """
+    Polls each source on its own timer; a heap keyed by due time picks the
+    next one. New articles are handed to `on_articles` in the background, and
+    polling pauses while `backlog()` (articles still rendering) is at or
+    above `max_backlog`.
+    """
+
+    def __init__(self, sources: List, interval: float, on_articles: Callable[[List[Article]], Awaitable[None]],
+                 backlog: Optional[Callable[[], int]] = None, max_backlog: Optional[int] = None):
+        min_i = float(os.getenv("POLL_MIN_INTERVAL_SECONDS", str(max(30.0, interval / 4))))
+        max_i = float(os.getenv("POLL_MAX_INTERVAL_SECONDS", str(interval * 6)))
+        self.timers = [
+            SourceTimer(s, float(getattr(s, "poll_interval", None) or interval), min_i, max_i)
+            for s in sources
+        ]
+        self.on_articles = on_articles
+        self.backlog = backlog or (lambda: 0)
+        self.max_backlog = max_backlog if max_backlog is not None else int(os.getenv("MAX_RENDER_BACKLOG", "4"))
+        self._heap: List[Tuple[float, int, SourceTimer]] = []
+        self._seq = itertools.count()
+        self._tasks = set()
+
+    def _push(self, t: SourceTimer, due: float):
+        t.next_due = due
+        heapq.heappush(self._heap, (due, next(self._seq), t))
+
+    async def _poll(self, t: SourceTimer):
+        arts = await _fetch_source(t.source)
+        if arts is None:
+            t.on_error()
+            return
+        new = _filter_new(arts)
+        _commit_state([t.source])
+        t.on_result(len(new))
+        if new:
+            print(f"[INFO] {getattr(t.source, 'name', '?')}: {len(new)} new articles (next poll ~{t.interval:.0f}s)")
+            task = asyncio.create_task(self.on_articles(new))
+            self._tasks.add(task)
+            task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"[WARN] Handling new articles failed: {task.exception()!r}")
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        for t in self.timers:
+            self._push(t, now)
+        while self._heap:
+            due, _, t = heapq.heappop(self._heap)
+            await asyncio.sleep(max(0.0, due - loop.time()))
+            if self.backlog() >= self.max_backlog:
+                # render side is saturated: check again shortly without polling
+                self._push(t, loop.time() + t.min_interval)
+                continue
+            await self._poll(t)
+            self._push(t, loop.time() + t.delay())
+
+async def run_poll_loop(config_path: Path, on_articles: Callable[[List[Article]], Awaitable[None]],
+                        backlog: Optional[Callable[[], int]] = None):
+    """
+    Initialize DB, build sources, and poll each on its own adaptive timer forever.
     Each poll ensures NewsAPISource yields 6 fresh articles for video generation.
     """
     init_db()
     sources, interval = build_sources(config_path)
-    print(f"Loaded {len(sources)} sources; polling every {interval}s")
-
-    while True:
-        new_articles = await poll_once(sources)
-        if new_articles:
-            print(f"[INFO] Got {len(new_articles)} new articles")
-            await on_articles(new_articles)
-        else:
-            print("[INFO] No new articles this cycle")
-        await asyncio.sleep(interval)
\ No newline at end of file
+    print(f"Loaded {len(sources)} sources; base poll interval {interval}s")
+    await AdaptiveScheduler(sources, interval, on_articles, backlog=backlog).run()
@@ -1,20 +1,79 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 from ..models import Article
+from .. import http_pool, db
 
 class BaseSource:
     """
     Abstract base class for all content sources.
     Every source must implement `fetch()` to return a list of Article objects.
+
+    Fetch state (HTTP validators, cursors) set during fetch() is only staged;
+    the scheduler calls commit_state() once the returned articles are marked
+    seen, or discard_state() if the fetch failed, so a failed poll never
+    advances past articles nobody recorded.
     """
 
     def __init__(self, name: str, max_articles: Optional[int] = None):
         self.name = name
         # Allows sources like NewsAPI to enforce a limit (e.g. 6 articles)
         self.max_articles = max_articles
+        # Base polling interval override (feeds.yaml `poll_interval_seconds`)
+        self.poll_interval: Optional[float] = None
+        self._pending: Dict[str, dict] = {}  # state_key -> fields to persist on commit
 
     async def fetch(self) -> List[Article]:
         """
         Fetch new articles and return them as a list of Article objects.
         Must be implemented by subclasses.
         """
-        raise NotImplementedError("Subclasses must implement fetch()")
\ No newline at end of file
+        raise NotImplementedError("Subclasses must implement fetch()")
+
+    async def get(self, url: str, **kwargs):
+        """
+        GET through the shared pooled client (bounded by FETCH_CONCURRENCY).
+        """
+        return await http_pool.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs):
+        return await http_pool.request("POST", url, **kwargs)
+
+    async def conditional_get(self, state_key: str, url: str, headers: Optional[dict] = None, **kwargs):
+        """
+        GET with If-None-Match/If-Modified-Since from the last successful
+        fetch of `state_key`. Returns None on 304 (nothing new), else the
+        response; validators of a 200 are staged for the next poll.
+        """
+        state = db.get_source_state(self.name, state_key)
+        headers = dict(headers or {})
+        if state.get("etag"):
+            headers["If-None-Match"] = state["etag"]
+        if state.get("last_modified"):
+            headers["If-Modified-Since"] = state["last_modified"]
+        r = await self.get(url, headers=headers, **kwargs)
+        if r.status_code == 304:
+            return None
+        if r.status_code == 200 and (r.headers.get("etag") or r.headers.get("last-modified")):
+            self._stage(state_key, etag=r.headers.get("etag"), last_modified=r.headers.get("last-modified"))
+        return r
+
+    def cursor(self, state_key: str) -> Optional[str]:
+        return db.get_source_state(self.name, state_key).get("cursor")
+
+    def save_cursor(self, state_key: str, value: Optional[str]):
+        self._stage(state_key, cursor=value)
+
+    def _stage(self, state_key: str, **fields):
+        self._pending.setdefault(state_key, {}).update(fields)
+
+    def commit_state(self):
+        # Persist staged validators/cursors; call after the fetched articles are marked seen
+        pending, self._pending = self._pending, {}
+        for state_key, fields in pending.items():
+            db.set_source_state(self.name, state_key, **fields)
+
+    def discard_state(self, state_key: Optional[str] = None):
+        # Drop staged state of one key (a failed endpoint) or of the whole fetch
+        if state_key is None:
+            self._pending.clear()
+        else:
+            self._pending.pop(state_key, None)
@@ -1,4 +1,4 @@
-import os, httpx, asyncio, json
+import os, asyncio, json
 from typing import List
 from .base import BaseSource
 from ..models import Article
@@ -21,13 +21,14 @@ class GenericJSONSource(BaseSource):
         headers = {k: env_expand(v) for k,v in (self.params.get("headers") or {}).items()}
         query = {k: env_expand(v) for k,v in (self.params.get("query") or {}).items()}
         body = self.params.get("body")
-        async with httpx.AsyncClient(timeout=30, headers=headers) as client:
-            if method == "POST":
-                r = await client.post(url, params=query, json=body)
-            else:
-                r = await client.get(url, params=query)
-            r.raise_for_status()
-            data = r.json()
+        if method == "POST":
+            r = await self.post(url, params=query, json=body, headers=headers)
+        else:
+            r = await self.conditional_get("feed", url, params=query, headers=headers)
+            if r is None:
+                return []  # 304: feed unchanged since the last poll
+        r.raise_for_status()
+        data = r.json()
 
         # naive extraction; for complex JSON use your own adapter
         titles = []
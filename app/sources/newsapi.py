@@ -1,54 +1,87 @@
-import os, httpx, asyncio, random, datetime
-from typing import List
+import os, asyncio, random, datetime
+from typing import List, Optional
 from .base import BaseSource
 from ..models import Article
 
 API_KEY = os.getenv("NEWSAPI_KEY")
 
-# Endpoint templates
+# Endpoint templates (base URL overridable for local stand-ins, see bench/pipeline.py)
+BASE_URL = os.getenv("NEWSAPI_BASE_URL", "https://newsapi.org/v2").rstrip("/")
 ENDPOINTS = {
-    "techcrunch": "https://newsapi.org/v2/top-headlines?sources=techcrunch",
-    "us_business": "https://newsapi.org/v2/top-headlines?country=us&category=business",
-    "wsj": "https://newsapi.org/v2/everything?domains=wsj.com",
+    "techcrunch": f"{BASE_URL}/top-headlines?sources=techcrunch",
+    "us_business": f"{BASE_URL}/top-headlines?country=us&category=business",
+    "wsj": f"{BASE_URL}/everything?domains=wsj.com",
 }
 
 class NewsAPISource(BaseSource):
-    def __init__(self, name: str = "newsapi"):
+    def __init__(self, name: str = "newsapi", params: Optional[dict] = None):
         super().__init__(name)
+        self.params = params or {}
+
+    async def _top_headlines(self, key: str) -> List[dict]:
+        # top-headlines has no `from=`; rely on ETag/Last-Modified validators
+        r = await self.conditional_get(key, ENDPOINTS[key], params={"apiKey": API_KEY})
+        return [] if r is None else r.json().get("articles", [])
+
+    async def _wsj(self) -> List[dict]:
+        # Only ask for articles newer than the publishedAt high-water mark of the last poll
+        high_water = self.cursor("wsj")
+        six_months_ago = (datetime.datetime.utcnow() - datetime.timedelta(days=180)).date().isoformat()
+        r = await self.conditional_get("wsj", ENDPOINTS["wsj"], params={
+            "apiKey": API_KEY,
+            "from": high_water or six_months_ago,
+            "sortBy": "publishedAt",
+            "pageSize": 50,  # grab a batch
+        })
+        if r is None:
+            return []
+        items = r.json().get("articles", [])
+        if high_water:
+            # `from` is inclusive; drop the item that set the mark
+            items = [i for i in items if (i.get("publishedAt") or "") > high_water]
+        newest = max((i.get("publishedAt") or "" for i in items), default="")
+        if newest:
+            self.save_cursor("wsj", newest)
+        return items
 
     async def fetch(self) -> List[Article]:
         if not API_KEY:
             return []
 
+        # All three endpoints in parallel on the shared client; a failing one
+        # keeps its old validators/cursor and does not sink the others
+        keys = ["techcrunch", "us_business", "wsj"]
+        res = await asyncio.gather(
+            self._top_headlines("techcrunch"),
+            self._top_headlines("us_business"),
+            self._wsj(),
+            return_exceptions=True,
+        )
+        errors = [r for r in res if isinstance(r, Exception)]
+        if len(errors) == len(res):
+            raise errors[0]
+        for key, r in zip(keys, res):
+            if isinstance(r, Exception):
+                print(f"[WARN] NewsAPI {key} failed: {r}")
+                self.discard_state(key)
+        tc_data, bus_data, wsj_data = [[] if isinstance(r, Exception) else r for r in res]
+
         results: List[Article] = []
-        async with httpx.AsyncClient(timeout=30) as client:
-            # --- 1. TechCrunch (latest 2)
-            tc_resp = await client.get(ENDPOINTS["techcrunch"], params={"apiKey": API_KEY})
-            tc_data = tc_resp.json().get("articles", [])
-            for item in tc_data[:2]:
-                results.append(self._to_article("techcrunch", item))
-
-            # --- 2. US Business (latest 2)
-            bus_resp = await client.get(ENDPOINTS["us_business"], params={"apiKey": API_KEY})
-            bus_data = bus_resp.json().get("articles", [])
-            for item in bus_data[:2]:
-                results.append(self._to_article("us_business", item))
-
-            # --- 3. WSJ (random 2 from last 6 months)
-            six_months_ago = (datetime.datetime.utcnow() - datetime.timedelta(days=180)).date().isoformat()
-            wsj_resp = await client.get(ENDPOINTS["wsj"], params={
-                "apiKey": API_KEY,
-                "from": six_months_ago,
-                "sortBy": "publishedAt",
-                "pageSize": 50,  # grab a batch
-            })
-            wsj_data = wsj_resp.json().get("articles", [])
-            if len(wsj_data) > 2:
-                chosen = random.sample(wsj_data, 2)
-            else:
-                chosen = wsj_data
-            for item in chosen:
-                results.append(self._to_article("wsj", item))
+        # --- 1. TechCrunch (latest 2)
+        for item in tc_data[:2]:
+            results.append(self._to_article("techcrunch", item))
+
+        # --- 2. US Business (latest 2)
+        for item in bus_data[:2]:
+            results.append(self._to_article("us_business", item))
+
+        # --- 3. WSJ (random 2 from what is new since the last poll)
+        if len(wsj_data) > 2:
+            chosen = random.sample(wsj_data, 2)
+        else:
+            chosen = wsj_data
+        for item in chosen:
+            results.append(self._to_article("wsj", item))
 
         return results
 
@@ -60,4 +93,5 @@ class NewsAPISource(BaseSource):
             title=(item.get("title") or "").strip(),
             url=item.get("url"),
             body=item.get("content") or item.get("description") or "",
+            published_at=item.get("publishedAt"),
         )
\ No newline at end of file
@@ -1,34 +1,61 @@
-import httpx, asyncio
+import os, time, asyncio
 from typing import List
 from .base import BaseSource
 from ..models import Article
 
 REDDIT_URL_TMPL = "https://www.reddit.com/r/{sub}/{sort}.json"
+CURSOR_MAX_AGE = float(os.getenv("REDDIT_CURSOR_MAX_AGE_SECONDS", "21600"))
 
 class RedditSource(BaseSource):
     def __init__(self, name: str, params: dict):
         super().__init__(name)
         self.params = params
 
+    async def _fetch_sub(self, sub: str, sort: str, limit: int, headers: dict) -> List[Article]:
+        params = {"limit": limit}
+        # On /new, `before=<fullname>` returns only posts newer than the last poll's newest.
+        # The cursor is stored as "<fullname>|<created_utc>".
+        cursor = self.cursor(sub) if sort == "new" else None
+        before, anchor_ts = (cursor.split("|") + ["0"])[:2] if cursor else (None, "0")
+        if before:
+            params["before"] = before
+        r = await self.conditional_get(sub, REDDIT_URL_TMPL.format(sub=sub, sort=sort), params=params, headers=headers)
+        if r is None or r.status_code != 200:
+            return []
+        data = r.json()
+        children = data.get("data", {}).get("children", [])
+        if sort == "new":
+            if children:
+                top = children[0].get("data", {})
+                self.save_cursor(sub, f"{top.get('name')}|{top.get('created_utc', 0)}")
+            elif before and time.time() - float(anchor_ts) > CURSOR_MAX_AGE:
+                # no news for a long time: the anchor post may have been deleted,
+                # which makes `before` return nothing forever; start over
+                self.save_cursor(sub, None)
+        out = []
+        for child in children:
+            d = child.get("data", {})
+            out.append(Article(
+                source=f"{self.name}:{sub}",
+                external_id=d.get("id"),
+                title=d.get("title",""),
+                url="https://www.reddit.com" + d.get("permalink",""),
+                body=d.get("selftext","") or d.get("url_overridden_by_dest","")
+            ))
+        return out
+
     async def fetch(self) -> List[Article]:
         subs = self.params.get("subreddits", [])
         sort = self.params.get("sort", "hot")
         limit = self.params.get("limit", 10)
         headers = {"User-Agent": "shorts-factory/1.0"}
+        # Subreddits are fetched concurrently; one failing sub does not sink the rest
+        results = await asyncio.gather(*[self._fetch_sub(sub, sort, limit, headers) for sub in subs], return_exceptions=True)
         out = []
-        async with httpx.AsyncClient(timeout=30, headers=headers) as client:
-            for sub in subs:
-                r = await client.get(REDDIT_URL_TMPL.format(sub=sub, sort=sort), params={"limit": limit})
-                if r.status_code != 200:
-                    continue
-                data = r.json()
-                for child in data.get("data", {}).get("children", []):
-                    d = child.get("data", {})
-                    out.append(Article(
-                        source=f"{self.name}:{sub}",
-                        external_id=d.get("id"),
-                        title=d.get("title",""),
-                        url="https://www.reddit.com" + d.get("permalink",""),
-                        body=d.get("selftext","") or d.get("url_overridden_by_dest","")
-                    ))
+        for sub, res in zip(subs, results):
+            if isinstance(res, Exception):
+                print(f"[WARN] Subreddit {sub} failed: {res}")
+                self.discard_state(sub)
+                continue
+            out.extend(res)
         return out
@@ -1,50 +1,56 @@
-import os, httpx, math, shutil
+import os, httpx, asyncio
 from pathlib import Path
-from typing import List, Tuple
+from typing import Optional, Tuple
+from .media_cache import get_store
+from .downloads import get_download_manager
+from . import metrics
 
-PIXABAY_IMG = "https://pixabay.com/api/"
-PIXABAY_VID = "https://pixabay.com/api/videos/"
+PIXABAY_BASE_URL = os.getenv("PIXABAY_BASE_URL", "https://pixabay.com/api").rstrip("/")
+PIXABAY_IMG = f"{PIXABAY_BASE_URL}/"
+PIXABAY_VID = f"{PIXABAY_BASE_URL}/videos/"
 
-def pixabay_search(query: str, out_dir: Path, max_items: int = 5) -> Tuple[list, list]:
+async def _search(client: httpx.AsyncClient, key: str, query: str, max_items: int) -> Tuple[dict, bool]:
+    # Returns (found, complete); complete is False if either request was refused (429/5xx)
+    params = {"key": key, "q": query, "safesearch":"true", "per_page": max_items}
+    ri, rv = await asyncio.gather(
+        client.get(PIXABAY_IMG, params=params),
+        client.get(PIXABAY_VID, params=params),
+    )
+    imgs, vids = [], []
+    if ri.status_code == 200:
+        for hit in ri.json().get("hits", []):
+            url = hit.get("largeImageURL") or hit.get("webformatURL")
+            if url: imgs.append(url)
+    if rv.status_code == 200:
+        for hit in rv.json().get("hits", []):
+            v = hit.get("videos", {}).get("medium", {}).get("url") or hit.get("videos", {}).get("small", {}).get("url")
+            if v: vids.append(v)
+    return {"imgs": imgs, "vids": vids}, ri.status_code == 200 and rv.status_code == 200
+
+async def pixabay_search(query: str, out_dir: Path, max_items: int = 5, deadline: Optional[float] = None) -> Tuple[list, list]:
     key = os.getenv("PIXABAY_API_KEY")
     if not key:
         raise RuntimeError("PIXABAY_API_KEY missing")
-    params = {"key": key, "q": query, "safesearch":"true", "per_page": max_items}
-    out_dir.mkdir(parents=True, exist_ok=True)
-    imgs, vids = [], []
-    with httpx.Client(timeout=30) as client:
-        ri = client.get(PIXABAY_IMG, params=params)
-        if ri.status_code == 200:
-            for hit in ri.json().get("hits", []):
-                url = hit.get("largeImageURL") or hit.get("webformatURL")
-                if url: imgs.append(url)
-        rv = client.get(PIXABAY_VID, params=params)
-        if rv.status_code == 200:
-            for hit in rv.json().get("hits", []):
-                v = hit.get("videos", {}).get("medium", {}).get("url") or hit.get("videos", {}).get("small", {}).get("url")
-                if v: vids.append(v)
-    # download
-    img_paths, vid_paths = [], []
-    for u in imgs[:max_items]:
-        p = out_dir / os.path.basename(u.split("?")[0])
-        try:
-            with httpx.stream("GET", u, timeout=120) as r:
-                r.raise_for_status()
-                with open(p, "wb") as f:
-                    for chunk in r.iter_bytes():
-                        f.write(chunk)
-            img_paths.append(p)
-        except Exception:
-            continue
-    for u in vids[:max_items]:
-        p = out_dir / os.path.basename(u.split("?")[0])
-        try:
-            with httpx.stream("GET", u, timeout=300) as r:
-                r.raise_for_status()
-                with open(p, "wb") as f:
-                    for chunk in r.iter_bytes():
-                        f.write(chunk)
-            vid_paths.append(p)
-        except Exception:
-            continue
-    return img_paths, vid_paths
+    if deadline is None:
+        deadline = float(os.getenv("MEDIA_DEADLINE_SECONDS", "120"))
+    store = get_store(out_dir)
+    dm = get_download_manager()
+    # Search results are cached per (query, max_items) for MEDIA_QUERY_TTL_SECONDS
+    qkey = f"pixabay:{max_items}:{query.strip().lower()}"
+    async with metrics.span("pixabay") as sp:
+        found = store.get_query(qkey)
+        sp.set(cache_hit=found is not None)
+        if found is None:
+            found, complete = await _search(dm.client(), key, query, max_items)
+            if complete:
+                store.put_query(qkey, found)
+            else:
+                # use what came back, but do not cache a partial/empty answer for the whole TTL
+                print(f"[WARN] Pixabay search for '{query}' incomplete; not caching it")
+        # download concurrently; whatever is not done by the deadline is skipped
+        imgs, vids = found["imgs"][:max_items], found["vids"][:max_items]
+        paths = await dm.fetch_all(store, imgs + vids, query, deadline)
+        img_paths = [p for p in paths[:len(imgs)] if p]
+        vid_paths = [p for p in paths[len(imgs):] if p]
+        sp.set(imgs=len(img_paths), vids=len(vid_paths), missed=sum(p is None for p in paths))
+        return img_paths, vid_paths
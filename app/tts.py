@@ -1,13 +1,103 @@
-import os, httpx, uuid, json
+import os, re, httpx, uuid, json, time, hashlib, asyncio
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
+from .models import Script
+from . import metrics
 
-ELEVEN_TTS_URL = "https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
+ELEVEN_BASE_URL = os.getenv("ELEVENLABS_BASE_URL", "https://api.elevenlabs.io/v1").rstrip("/")
+ELEVEN_TTS_URL = ELEVEN_BASE_URL + "/text-to-speech/{voice_id}"
+VOICE_SETTINGS = {"stability": 0.5, "similarity_boost": 0.7}
 
-def synthesize_elevenlabs(text: str, voice_id: str, out_dir: Path) -> Path:
+_client: Optional[httpx.AsyncClient] = None
+_limiter = None
+_inflight: Dict[Path, asyncio.Task] = {}
+
+class _RateLimiter:
+    # At most `concurrency` requests in flight and `max_rps` starts per second
+    def __init__(self, concurrency: int, max_rps: float):
+        self._sem = asyncio.Semaphore(concurrency)
+        self._min_gap = 1.0 / max_rps if max_rps > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        await self._sem.acquire()
+        if self._min_gap:
+            async with self._lock:
+                now = time.monotonic()
+                wait = self._next - now
+                self._next = max(now, self._next) + self._min_gap
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+    async def __aexit__(self, *exc):
+        self._sem.release()
+
+def _get_client() -> httpx.AsyncClient:
+    global _client, _limiter
+    if _client is None:
+        _client = httpx.AsyncClient(timeout=120, limits=httpx.Limits(max_keepalive_connections=8))
+        _limiter = _RateLimiter(int(os.getenv("ELEVENLABS_CONCURRENCY", "2")), float(os.getenv("ELEVENLABS_MAX_RPS", "0")))
+    return _client
+
+async def shutdown():
+    # Close the pooled ElevenLabs client (plugin shutdown hook, see app.plugins)
+    global _client, _limiter
+    if _client is not None:
+        await _client.aclose()
+        _client = _limiter = None
+
+def cache_key(text: str, voice_id: str, model_id: str, voice_settings: dict) -> str:
+    blob = json.dumps([text, voice_id, model_id, voice_settings], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+def _retryable(exc: BaseException) -> bool:
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in (429, 500, 502, 503, 504)
+    return isinstance(exc, httpx.TransportError)
+
+@retry(retry=retry_if_exception(_retryable), wait=wait_exponential(multiplier=1, min=1, max=30),
+       stop=stop_after_attempt(5), reraise=True)
+async def _post_tts(url: str, headers: dict, payload: dict, dest: Path):
+    client = _get_client()
+    async with _limiter:
+        async with client.stream("POST", url, headers=headers, json=payload) as r:
+            r.raise_for_status()
+            with open(dest, "wb") as f:
+                async for chunk in r.aiter_bytes():
+                    f.write(chunk)
+
+async def synthesize_elevenlabs(text: str, voice_id: str, out_dir: Path) -> Path:
+    """
+    Synthesize `text` to MP3. Output is content-addressed by
+    (text, voice_id, model_id, voice_settings), so retries and re-renders of
+    the same script reuse the file instead of paying for synthesis again.
+    """
     api_key = os.getenv("ELEVENLABS_API_KEY")
-    if not api_key:
-        raise RuntimeError("ELEVENLABS_API_KEY not set")
+    model_id = os.getenv("ELEVENLABS_MODEL", "eleven_multilingual_v2")
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out_path = out_dir / f"voice_{cache_key(text, voice_id, model_id, VOICE_SETTINGS)[:32]}.mp3"
+    async with metrics.span("tts") as sp:
+        sp.set(chars=len(text))
+        if out_path.exists() and out_path.stat().st_size > 0:
+            sp.set(cache_hit=True)
+            return out_path
+        if not api_key:
+            raise RuntimeError("ELEVENLABS_API_KEY not set")
+        # Identical text requested twice (e.g. early warm-up while the LLM streams) shares one request
+        task = _inflight.get(out_path)
+        sp.set(cache_hit=False, shared=task is not None)
+        if task is None:
+            task = asyncio.create_task(_synthesize_to(out_path, text, voice_id, model_id, api_key))
+            _inflight[out_path] = task
+            task.add_done_callback(lambda _t: _inflight.pop(out_path, None))
+        path = await asyncio.shield(task)
+        if not sp.attrs["shared"]:
+            sp.set(bytes=metrics.file_size(path))
+        return path
+
+async def _synthesize_to(out_path: Path, text: str, voice_id: str, model_id: str, api_key: str) -> Path:
     headers = {
         "xi-api-key": api_key,
         "accept": "audio/mpeg",
@@ -15,15 +105,64 @@ def synthesize_elevenlabs(text: str, voice_id: str, out_dir: Path) -> Path:
     }
     payload = {
         "text": text,
-        "model_id": os.getenv("ELEVENLABS_MODEL", "eleven_multilingual_v2"),
-        "voice_settings": {"stability": 0.5, "similarity_boost": 0.7}
+        "model_id": model_id,
+        "voice_settings": VOICE_SETTINGS
     }
-    out_dir.mkdir(parents=True, exist_ok=True)
-    out_path = out_dir / f"voice_{uuid.uuid4().hex}.mp3"
-    with httpx.Client(timeout=120) as client:
-        with client.stream("POST", ELEVEN_TTS_URL.format(voice_id=voice_id), headers=headers, json=payload) as r:
-            r.raise_for_status()
-            with open(out_path, "wb") as f:
-                for chunk in r.iter_bytes():
-                    f.write(chunk)
+    tmp = out_path.parent / f".voice_{uuid.uuid4().hex}.part"
+    try:
+        await _post_tts(ELEVEN_TTS_URL.format(voice_id=voice_id), headers, payload, tmp)
+        os.replace(tmp, out_path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
     return out_path
+
+def split_script(script: Script) -> List[str]:
+    # hook, each body sentence, cta
+    body = [p.strip() for p in re.split(r'(?<=[.!?])\s+|\n+', script.body or "") if p.strip()]
+    return [c for c in [script.hook.strip(), *body, script.cta.strip()] if c]
+
+async def synthesize_chunked(script: Script, voice_id: str, out_dir: Path, gap_ms: Optional[int] = None) -> Tuple[Path, List[Tuple[str, float, float]]]:
+    """
+    Synthesize the script sentence by sentence in parallel and stitch the
+    chunks in order as they arrive. Returns the track and one caption
+    segment per chunk with exact boundaries, so no Whisper pass is needed.
+    """
+    from pydub import AudioSegment
+    gap_ms = gap_ms if gap_ms is not None else int(os.getenv("TTS_CHUNK_GAP_MS", "120"))
+    chunks = split_script(script)
+    if not chunks:
+        raise RuntimeError("Script has no text to synthesize")
+    key = hashlib.sha256(json.dumps([chunks, voice_id, os.getenv("ELEVENLABS_MODEL", "eleven_multilingual_v2"), gap_ms]).encode("utf-8")).hexdigest()[:32]
+    out_path = out_dir / f"voice_chunked_{key}.mp3"
+    segs_path = out_path.with_suffix(".segments.json")
+    if out_path.exists() and segs_path.exists():
+        return out_path, [tuple(s) for s in json.loads(segs_path.read_text())]
+
+    tasks = [asyncio.create_task(synthesize_elevenlabs(c, voice_id, out_dir)) for c in chunks]
+    track = AudioSegment.empty()
+    gap = AudioSegment.silent(duration=gap_ms)
+    segs = []
+    try:
+        for text, task in zip(chunks, tasks):
+            # stitch chunk i while later chunks are still being synthesized
+            piece = await asyncio.to_thread(AudioSegment.from_file, await task)
+            if len(track):
+                track += gap
+            start = len(track) / 1000.0
+            track += piece
+            segs.append((text, start, len(track) / 1000.0))
+    except BaseException:
+        for t in tasks:
+            t.cancel()
+        raise
+
+    tmp = out_dir / f".voice_{uuid.uuid4().hex}.part"
+    try:
+        await asyncio.to_thread(track.export, tmp, format="mp3")
+        os.replace(tmp, out_path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    segs_path.write_text(json.dumps(segs))
+    return out_path, segs
@@ -1,33 +1,181 @@
-import os, asyncio
+import os, json, asyncio, hashlib
 from pathlib import Path
+from typing import Dict, List, Optional
+from .. import metrics
 
 # Official Content Posting API requires access + OAuth. See docs.
 # Fallback: Playwright to automate web upload using saved session.
 
-async def playwright_upload(video_path: str, caption: str):
-    from playwright.async_api import async_playwright
-    storage_state = os.getenv("TIKTOK_STORAGE_STATE", "secrets/tiktok_state.json")
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=False)
-        context = await browser.new_context(storage_state=storage_state if Path(storage_state).exists() else None)
-        page = await context.new_page()
-        await page.goto("https://www.tiktok.com/upload?lang=en")
-        # If not logged in, user must log in manually once; then save storage
+UPLOAD_URL = os.getenv("TIKTOK_UPLOAD_URL", "https://www.tiktok.com/upload?lang=en")
+# Post button turns clickable once the video has finished uploading/processing
+READY_SELECTOR = os.getenv("TIKTOK_READY_SELECTOR", '[data-e2e="post-button"]:not([disabled]):not([aria-disabled="true"])')
+DONE_SELECTOR = os.getenv("TIKTOK_DONE_SELECTOR", "text=/(your video (has been|was) (uploaded|posted)|manage (your )?posts)/i")
+
+def _state_paths() -> List[str]:
+    # One saved session per account, e.g. TIKTOK_STORAGE_STATE=secrets/a.json,secrets/b.json
+    raw = os.getenv("TIKTOK_STORAGE_STATE", "secrets/tiktok_state.json")
+    return [p.strip() for p in raw.split(",") if p.strip()]
+
+def _digest(state: dict) -> str:
+    return hashlib.sha256(json.dumps(state, sort_keys=True).encode("utf-8")).hexdigest()
+
+class _Account:
+    def __init__(self, state_path: str):
+        self.state_path = state_path
+        self.context = None
+        self.browser = None  # browser the context belongs to
+        self.broken = True   # needs a (new) context before the next upload
+        self.saved_digest: Optional[str] = None
+
+class TikTokUploader:
+    """
+    Warm pool of headless browser contexts, one per account (saved session).
+    Uploads run concurrently, one per free account; each waits for the page's
+    own ready/done signals and writes the session back only if it changed.
+    A context whose page crashed, or whose browser died, is replaced (and the
+    browser relaunched) before the account is used again.
+    """
+
+    def __init__(self, state_paths: Optional[List[str]] = None, headless: Optional[bool] = None):
+        self.state_paths = state_paths or _state_paths()
+        self.headless = headless if headless is not None else os.getenv("TIKTOK_HEADLESS", "1") == "1"
+        self.timeout_ms = int(float(os.getenv("TIKTOK_UPLOAD_TIMEOUT", "600")) * 1000)
+        self._pw = None
+        self._browser = None
+        self._accounts: Dict[str, _Account] = {}
+        self._free: Optional[asyncio.Queue] = None
+        self._start_lock = asyncio.Lock()
+
+    async def start(self):
+        async with self._start_lock:
+            if self._browser is not None:
+                return
+            from playwright.async_api import async_playwright
+            self._pw = await async_playwright().start()
+            self._browser = await self._pw.chromium.launch(headless=self.headless)
+            self._free = asyncio.Queue()
+            for path in self.state_paths:
+                acct = _Account(path)
+                if Path(path).exists():
+                    acct.saved_digest = _digest(json.loads(Path(path).read_text(encoding="utf-8")))
+                await self._open_context(acct)
+                self._accounts[path] = acct
+                self._free.put_nowait(acct)
+
+    async def _open_context(self, acct: _Account):
+        # If not logged in, user must log in manually once (headed); then save storage
+        path = acct.state_path
+        acct.context = await self._browser.new_context(storage_state=path if Path(path).exists() else None)
+        acct.browser = self._browser
+        acct.broken = False
+
+    async def _recycle(self, acct: _Account):
+        # Replace the account's context, relaunching the browser first if it died
+        async with self._start_lock:
+            if not self._browser.is_connected():
+                print("[WARN] TikTok browser disconnected; relaunching")
+                try:
+                    await self._browser.close()
+                except Exception:
+                    pass
+                self._browser = await self._pw.chromium.launch(headless=self.headless)
+            if acct.context is not None and acct.browser is self._browser:
+                try:
+                    await acct.context.close()
+                except Exception:
+                    pass
+            print(f"[WARN] Recycling TikTok browser context for {acct.state_path}")
+            await self._open_context(acct)
+
+    def _usable(self, acct: _Account) -> bool:
+        return not acct.broken and acct.browser is self._browser and self._browser.is_connected()
+
+    async def _save_state(self, acct: _Account):
+        state = await acct.context.storage_state()
+        digest = _digest(state)
+        if digest == acct.saved_digest:
+            return
+        p = Path(acct.state_path)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = p.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(state), encoding="utf-8")
+        os.replace(tmp, p)
+        acct.saved_digest = digest
+
+    async def upload(self, video_path: str, caption: str):
+        await self.start()
+        acct = await self._free.get()
+        try:
+            if not self._usable(acct):
+                await self._recycle(acct)
+            try:
+                page = await acct.context.new_page()
+            except Exception:
+                acct.broken = True
+                raise
+            page.on("crash", lambda _: setattr(acct, "broken", True))
+            try:
+                async with metrics.span("tiktok_upload") as sp:
+                    sp.set(bytes=metrics.file_size(video_path), account=acct.state_path)
+                    await self._post(page, video_path, caption)
+                    await self._save_state(acct)
+            except Exception:
+                if page.is_closed() or not self._browser.is_connected():
+                    acct.broken = True
+                raise
+            finally:
+                try:
+                    await page.close()
+                except Exception:
+                    acct.broken = True
+        finally:
+            # a broken account goes back too; it gets a fresh context when next taken
+            self._free.put_nowait(acct)
+
+    async def _post(self, page, video_path: str, caption: str):
+        await page.goto(UPLOAD_URL)
         # Upload file
-        input_file = page.locator('input[type="file"]')
-        await input_file.set_input_files(video_path)
+        await page.locator('input[type="file"]').set_input_files(video_path)
         # Caption textarea
         await page.wait_for_selector("textarea")
         await page.fill("textarea", caption[:2200])
-        # Click Post (selector may vary by region; adjust if necessary)
-        # Many locales use data-e2e="post-button"
-        try:
-            await page.click('[data-e2e="post-button"]', timeout=60000)
-        except:
-            # Try alternative button text
-            await page.get_by_role("button", name="Post").click(timeout=60000)
-        # Give some time to process
-        await page.wait_for_timeout(10000)
-        # Save storage for reuse
-        await context.storage_state(path=storage_state)
-        await browser.close()
+        # Wait until TikTok has the file, not a fixed sleep. The selector may vary
+        # by region, so a button labelled "Post" also counts; click() then
+        # waits for it to become enabled.
+        post = page.locator(READY_SELECTOR).or_(page.get_by_role("button", name="Post", exact=True)).first
+        await post.wait_for(state="visible", timeout=self.timeout_ms)
+        await post.click(timeout=self.timeout_ms)
+        await page.locator(DONE_SELECTOR).first.wait_for(state="visible", timeout=self.timeout_ms)
+
+    async def close(self):
+        if self._browser is not None:
+            for acct in self._accounts.values():
+                if not self._usable(acct):
+                    continue
+                try:
+                    await self._save_state(acct)
+                except Exception as e:
+                    print(f"[WARN] Could not save TikTok session {acct.state_path}: {e}")
+            await self._browser.close()
+            await self._pw.stop()
+            self._browser = self._pw = None
+            self._accounts.clear()
+
+_uploader: Optional[TikTokUploader] = None
+
+def get_tiktok_uploader() -> TikTokUploader:
+    global _uploader
+    if _uploader is None:
+        _uploader = TikTokUploader()
+    return _uploader
+
+async def close_tiktok_uploader():
+    global _uploader
+    if _uploader is not None:
+        await _uploader.close()
+        _uploader = None
+
+shutdown = close_tiktok_uploader  # plugin shutdown hook, see app.plugins
+
+async def playwright_upload(video_path: str, caption: str):
+    await get_tiktok_uploader().upload(video_path, caption)
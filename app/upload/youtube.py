@@ -1,33 +1,135 @@
-import os, time
-from typing import List
+import os, re, json, time, random, asyncio, threading, contextvars, http.client
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Tuple
+import httplib2
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
+from google.auth.transport.requests import AuthorizedSession, Request
 from google.oauth2.credentials import Credentials
 from googleapiclient.http import MediaFileUpload
+from .. import metrics
 
 SCOPES = ['https://www.googleapis.com/auth/youtube.upload']
 
+# 8 MiB default; resumable chunks must be a multiple of 256 KiB
+CHUNK_SIZE = max(1, int(os.getenv("YOUTUBE_CHUNK_MB", "8"))) * 1024 * 1024
+MAX_RETRIES = int(os.getenv("YOUTUBE_MAX_RETRIES", "8"))
+RETRY_STATUS = {500, 502, 503, 504}
+# Transport failures worth another try (httplib2 and http.client errors are not all OSError)
+RETRY_ERRORS = (OSError, httplib2.HttpLib2Error, http.client.HTTPException)
+
+_creds: Optional[Credentials] = None
+_creds_lock = threading.Lock()
+_local = threading.local()  # httplib2 is not thread-safe: one service per upload thread
+
+def _credentials() -> Credentials:
+    """
+    Load the token once per process and refresh it only when it has expired;
+    the token file is rewritten only when the token changed.
+    """
+    global _creds
+    with _creds_lock:
+        if _creds is not None and _creds.valid:
+            return _creds
+        client_secrets = os.getenv("YOUTUBE_CLIENT_SECRETS")
+        token_file = os.getenv("YOUTUBE_TOKEN", "secrets/youtube-oauth-token.json")
+        creds = _creds
+        if creds is None and os.path.exists(token_file):
+            creds = Credentials.from_authorized_user_file(token_file, SCOPES)
+        if not creds or not creds.valid:
+            if creds and creds.expired and creds.refresh_token:
+                creds.refresh(Request())
+            else:
+                flow = InstalledAppFlow.from_client_secrets_file(client_secrets, SCOPES)
+                creds = flow.run_local_server(port=0)
+            with open(token_file, 'w') as token:
+                token.write(creds.to_json())
+        _creds = creds
+        return creds
+
 def get_service():
-    client_secrets = os.getenv("YOUTUBE_CLIENT_SECRETS")
-    token_file = os.getenv("YOUTUBE_TOKEN", "secrets/youtube-oauth-token.json")
-    creds = None
-    if os.path.exists(token_file):
-        creds = Credentials.from_authorized_user_file(token_file, SCOPES)
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
+    creds = _credentials()
+    service = getattr(_local, "service", None)
+    if service is None or getattr(_local, "creds", None) is not creds:
+        _local.service = build('youtube', 'v3', credentials=creds, cache_discovery=False)
+        _local.creds = creds
+    return _local.service
+
+# --- resumable sessions ------------------------------------------------
+
+def _session_path(file_path: str) -> Path:
+    return Path(f"{file_path}.ytsession.json")
+
+def _load_session(file_path: str) -> Optional[str]:
+    # A saved session is only valid for the exact same file
+    p = _session_path(file_path)
+    try:
+        data = json.loads(p.read_text(encoding="utf-8"))
+        st = os.stat(file_path)
+        if data.get("size") == st.st_size and data.get("mtime") == st.st_mtime_ns:
+            return data.get("resumable_uri")
+    except Exception:
+        pass
+    return None
+
+def _save_session(file_path: str, uri: str):
+    st = os.stat(file_path)
+    p = _session_path(file_path)
+    tmp = p.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(json.dumps({"resumable_uri": uri, "size": st.st_size, "mtime": st.st_mtime_ns}), encoding="utf-8")
+    os.replace(tmp, p)
+
+def _clear_session(file_path: str):
+    _session_path(file_path).unlink(missing_ok=True)
+
+def _session_offset(uri: str, size: int) -> Tuple[Optional[int], Optional[dict]]:
+    """
+    Ask YouTube how much of a saved session it has (an empty PUT with
+    "Content-Range: bytes */size"). Returns (next byte offset, None), or
+    (None, video resource) if the upload already finished, or (None, None)
+    if the session is gone.
+    """
+    resp = AuthorizedSession(_credentials()).put(
+        uri, headers={"Content-Range": f"bytes */{size}", "Content-Length": "0"}, timeout=60)
+    if resp.status_code in (200, 201):
+        return None, resp.json()
+    if resp.status_code == 308:
+        m = re.match(r"bytes=0-(\d+)", resp.headers.get("Range", ""))
+        return (int(m.group(1)) + 1 if m else 0), None
+    if resp.status_code in (404, 410):
+        return None, None
+    raise HttpError(httplib2.Response({"status": resp.status_code}), resp.content, uri=uri)
+
+def _new_request(file_path: str, body: dict):
+    """
+    Build the insert request. If an earlier attempt saved its session, the
+    request continues it from the offset the server reports; returns
+    (request, None), or (None, response) if that upload had already finished.
+    """
+    # 9:16 + < 60s will be auto-considered Shorts by YouTube
+    media = MediaFileUpload(file_path, chunksize=CHUNK_SIZE, resumable=True, mimetype="video/*")
+    request = get_service().videos().insert(
+        part="snippet,status",
+        body=body,
+        media_body=media
+    )
+    uri = _load_session(file_path)
+    if uri:
+        offset, done = _session_offset(uri, media.size())
+        if done is not None:
+            return None, done
+        if offset is None:
+            print("[WARN] Saved YouTube upload session expired; starting over")
+            _clear_session(file_path)
         else:
-            flow = InstalledAppFlow.from_client_secrets_file(client_secrets, SCOPES)
-            creds = flow.run_local_server(port=0)
-        with open(token_file, 'w') as token:
-            token.write(creds.to_json())
-    return build('youtube', 'v3', credentials=creds)
+            request.resumable_uri = uri
+            request.resumable_progress = offset
+            print(f"[INFO] Resuming YouTube upload of {file_path} at {offset}/{media.size()} bytes")
+    return request, None
 
 def upload_video(file_path: str, title: str, description: str, tags: List[str], categoryId: str = "22", privacyStatus: str = "public"):
-    youtube = get_service()
-
     body=dict(
         snippet=dict(
             title=title,
@@ -41,19 +143,86 @@ def upload_video(file_path: str, title: str, description: str, tags: List[str],
         )
     )
 
-    # 9:16 + < 60s will be auto-considered Shorts by YouTube
-    media = MediaFileUpload(file_path, chunksize=-1, resumable=True, mimetype="video/*")
-
-    request = youtube.videos().insert(
-        part="snippet,status",
-        body=body,
-        media_body=media
-    )
+    with metrics.span("youtube_upload") as sp:
+        sp.set(bytes=metrics.file_size(file_path))
+        response = _upload(file_path, body)
+        sp.set(video_id=response.get("id"))
+    return response
 
-    response = None
+def _upload(file_path: str, body: dict) -> dict:
+    # After a failed chunk, googleapiclient asks the server for the committed
+    # offset on the next next_chunk() call, so retrying is just calling it again
+    request, response = _new_request(file_path, body)
+    saved_uri = request.resumable_uri if request is not None else None
+    retries = 0
     while response is None:
-        status, response = request.next_chunk()
-        if status:
-            print(f"Uploaded {int(status.progress() * 100)}%")
+        try:
+            status, response = request.next_chunk()
+        except HttpError as e:
+            code = e.resp.status
+            if code in (404, 410):
+                # Session expired on YouTube's side: start a fresh upload
+                print("[WARN] YouTube upload session expired; restarting upload")
+                _clear_session(file_path)
+                request, response = _new_request(file_path, body)
+                saved_uri = None
+                continue
+            if code not in RETRY_STATUS or retries >= MAX_RETRIES:
+                raise
+            err = e
+        except RETRY_ERRORS as e:
+            if retries >= MAX_RETRIES:
+                raise
+            err = e
+        else:
+            retries = 0
+            if request.resumable_uri and request.resumable_uri != saved_uri:
+                _save_session(file_path, request.resumable_uri)
+                saved_uri = request.resumable_uri
+            if status:
+                print(f"Uploaded {int(status.progress() * 100)}%")
+            continue
+        retries += 1
+        metrics.inc(f"{metrics.PREFIX}_upload_retries_total", 1, "Retried upload chunks", stage="youtube_upload")
+        delay = min(2 ** retries, 64) + random.random()
+        print(f"[WARN] YouTube upload error ({err}); retry {retries}/{MAX_RETRIES} in {delay:.1f}s")
+        time.sleep(delay)
+    _clear_session(file_path)
     print("Upload complete:", response.get("id"))
     return response
+
+class YouTubeUploader:
+    """
+    Background upload queue: uploads run on their own thread pool, so the
+    pipeline hands a finished video over and moves on.
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = workers or int(os.getenv("YOUTUBE_UPLOAD_WORKERS", "2"))
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="yt-upload")
+
+    def submit(self, file_path: str, title: str, description: str, tags: List[str], **kw) -> Future:
+        # carry the caller's trace id over to the upload thread
+        return self._pool.submit(contextvars.copy_context().run, upload_video, file_path, title, description, tags, **kw)
+
+    async def upload(self, file_path: str, title: str, description: str, tags: List[str], **kw) -> dict:
+        return await asyncio.wrap_future(self.submit(file_path, title, description, tags, **kw))
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
+
+_uploader: Optional[YouTubeUploader] = None
+
+def get_youtube_uploader() -> YouTubeUploader:
+    global _uploader
+    if _uploader is None:
+        _uploader = YouTubeUploader()
+    return _uploader
+
+def shutdown_youtube_uploader():
+    global _uploader
+    if _uploader is not None:
+        _uploader.shutdown()
+        _uploader = None
+
+shutdown = shutdown_youtube_uploader  # plugin shutdown hook, see app.plugins
@@ -2,9 +2,10 @@
 from pathlib import Path
 from typing import List, Tuple, Optional
 from moviepy.editor import (VideoFileClip, ImageClip, AudioFileClip, concatenate_videoclips, CompositeVideoClip)
-from PIL import Image, ImageDraw, ImageFont
+from .caption_render import caption_array, watermark_array
+from . import profiling
 import numpy as np
-import math, os
+import math
 
 W, H = 1080, 1920  # 9:16 vertical
 
@@ -23,64 +24,11 @@ def _fit_clip_to_vertical(clip):
         clip = clip.crop(y1=y1, y2=y1+new_h)
     return clip.resize((W, H))
 
-def _render_text_image(text: str, max_width: int = W-120, padding: int = 24) -> Image.Image:
-    # Create a caption image with PIL
-    bg = Image.new("RGBA", (max_width + padding*2, 10), (0, 0, 0, 0))
-    draw = ImageDraw.Draw(bg)
+def _vertical(clip):
+    # Proxies from app.proxies are already 1080x1920; skip the per-frame crop/resize
+    return clip if tuple(clip.size) == (W, H) else _fit_clip_to_vertical(clip)
 
-    # Try to load a common font; fallback to default
-    font_paths = [
-        "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
-        "/Library/Fonts/Arial.ttf",
-        "C:\\Windows\\Fonts\\arial.ttf",
-    ]
-    font = None
-    for fp in font_paths:
-        if os.path.exists(fp):
-            font = ImageFont.truetype(fp, 64)
-            break
-    if font is None:
-        font = ImageFont.load_default()
-
-    # Wrap text
-    words = text.split()
-    lines = []
-    line = ""
-    for w in words:
-        test = f"{line} {w}".strip()
-        bbox = draw.textbbox((0,0), test, font=font)
-        if bbox[2] > max_width and line:
-            lines.append(line)
-            line = w
-        else:
-            line = test
-    if line:
-        lines.append(line)
-
-    line_heights = []
-    max_line_w = 0
-    for ln in lines:
-        bbox = draw.textbbox((0,0), ln, font=font)
-        max_line_w = max(max_line_w, bbox[2])
-        line_heights.append(bbox[3])
-
-    total_h = sum(line_heights) + padding*2 + (len(lines)-1)*8
-    img = Image.new("RGBA", (max_line_w + padding*2, total_h), (0,0,0,0))
-    draw = ImageDraw.Draw(img)
-
-    # Draw semi-transparent rectangle backdrop
-    rect_color = (0,0,0,140)
-    draw.rounded_rectangle((0,0,img.width,img.height), radius=20, fill=rect_color)
-
-    y = padding
-    for i, ln in enumerate(lines):
-        bbox = draw.textbbox((0,0), ln, font=font)
-        draw.text(((img.width - bbox[2])//2, y), ln, font=font, fill=(255,255,255,255))
-        y += bbox[3] + 8
-
-    return img
-
-def compose_video(audio_path: Path, img_paths: List[Path], vid_paths: List[Path], captions: List[Tuple[str,float,float]], brand_handle: str, bgm_path: Optional[Path], out_path: Path) -> Path:
+def compose_video(audio_path: Path, img_paths: List[Path], vid_paths: List[Path], captions: List[Tuple[str,float,float]], brand_handle: str, bgm_path: Optional[Path], out_path: Path, threads: int = 4) -> Path:
     voice = AudioFileClip(str(audio_path))
     duration = voice.duration
 
@@ -94,14 +42,16 @@ def compose_video(audio_path: Path, img_paths: List[Path], vid_paths: List[Path]
         bg = ImageClip(np.full((H, W, 3), 10, dtype=np.uint8)).set_duration(duration)
         visuals.append(bg)
     else:
-        # tile clips to cover full duration
+        # tile clips to cover full duration; a reused asset shares one reader
+        opened = {}
         idx = 0
         while t_accum < duration and idx < len(parts) * 5:  # loop up to 5x
             p = parts[idx % len(parts)]
             if str(p).lower().endswith((".mp4",".mov",".webm",".mkv",".avi")):
                 try:
-                    clip = VideoFileClip(str(p)).without_audio()
-                    clip = _fit_clip_to_vertical(clip)
+                    if p not in opened:
+                        opened[p] = _vertical(VideoFileClip(str(p)).without_audio())
+                    clip = opened[p]
                     seg_dur = min(clip.duration, duration - t_accum)
                     visuals.append(clip.subclip(0, seg_dur))
                     t_accum += seg_dur
@@ -111,7 +61,7 @@ def compose_video(audio_path: Path, img_paths: List[Path], vid_paths: List[Path]
                 seg_dur = min( max(1.5, duration/len(parts)), duration - t_accum )
                 try:
                     ic = ImageClip(str(p)).set_duration(seg_dur)
-                    ic = _fit_clip_to_vertical(ic)
+                    ic = _vertical(ic)
                     visuals.append(ic)
                     t_accum += seg_dur
                 except Exception:
@@ -124,19 +74,13 @@ def compose_video(audio_path: Path, img_paths: List[Path], vid_paths: List[Path]
     overlays = []
 
     # Watermark / handle
-    wm_img = _render_text_image(brand_handle)
-    wm_path = out_path.parent / "wm.png"
-    wm_img.save(wm_path)
-    wm_clip = ImageClip(str(wm_path)).set_duration(duration).set_position(("center", H-200))
+    wm_clip = ImageClip(watermark_array(brand_handle)).set_duration(duration).set_position(("center", H-200))
     overlays.append(wm_clip.set_opacity(0.7))
 
     # Captions overlay (burned-in)
     for text, start, end in captions:
         if end <= start: continue
-        cap_img = _render_text_image(text)
-        cap_path = out_path.parent / f"cap_{int(start*1000)}.png"
-        cap_img.save(cap_path)
-        cap_clip = ImageClip(str(cap_path)).set_start(start).set_duration(end-start).set_position(("center","center"))
+        cap_clip = ImageClip(caption_array(text)).set_start(start).set_duration(end-start).set_position(("center","center"))
         overlays.append(cap_clip)
 
     composite = CompositeVideoClip([base, *overlays]).set_audio(voice)
@@ -157,6 +101,7 @@ def compose_video(audio_path: Path, img_paths: List[Path], vid_paths: List[Path]
             pass
 
     out_path.parent.mkdir(parents=True, exist_ok=True)
-    composite.write_videofile(str(out_path), codec="libx264", audio_codec="aac", fps=30, threads=4, preset="medium")
+    profiling.time_frames(composite, {"base": [base], "watermark": overlays[:1], "captions": overlays[1:]})
+    composite.write_videofile(str(out_path), codec="libx264", audio_codec="aac", fps=30, threads=threads, preset="medium")
     composite.close()
     return out_path
@@ -0,0 +1,131 @@
+import os, subprocess, tempfile
+from pathlib import Path
+from typing import List, Tuple, Optional
+from .caption_render import render_text_image
+
+# Alternative render engine: the same inputs as video.compose_video, expressed
+# as one ffmpeg filter graph so frames never pass through Python/numpy.
+
+W, H = 1080, 1920  # 9:16 vertical, same frame as video.py
+FFMPEG = os.getenv("FFMPEG_BINARY", "ffmpeg")
+FFPROBE = os.getenv("FFPROBE_BINARY", "ffprobe")
+FPS = 30
+VIDEO_EXTS = (".mp4",".mov",".webm",".mkv",".avi")
+
+def probe_duration(path: Path) -> float:
+    out = subprocess.run(
+        [FFPROBE, "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", str(path)],
+        capture_output=True, text=True, check=True,
+    ).stdout.strip()
+    return float(out)
+
+def plan_visuals(parts: List[Path], duration: float) -> List[Tuple[Path, float, bool]]:
+    # Mirrors the tiling loop in video.compose_video: videos play from the
+    # start until the voice ends, stills get max(1.5s, duration/len(parts)).
+    plan = []
+    t_accum = 0.0
+    idx = 0
+    while t_accum < duration and idx < len(parts) * 5:  # loop up to 5x
+        p = parts[idx % len(parts)]
+        is_video = str(p).lower().endswith(VIDEO_EXTS)
+        try:
+            if is_video:
+                seg_dur = min(probe_duration(p), duration - t_accum)
+            else:
+                seg_dur = min(max(1.5, duration/len(parts)), duration - t_accum)
+            plan.append((Path(p), seg_dur, is_video))
+            t_accum += seg_dur
+        except Exception:
+            pass
+        idx += 1
+    return plan
+
+def build_command(audio_path: Path, duration: float, plan: List[Tuple[Path, float, bool]], wm_png: Path,
+                  caption_pngs: List[Tuple[Path, float, float]], bgm_path: Optional[Path], out_path: Path,
+                  threads: int = 4) -> List[str]:
+    args = [FFMPEG, "-y", "-hide_banner", "-loglevel", "error"]
+    filters = []
+    n_in = 0
+
+    def add_input(*opts):
+        nonlocal n_in
+        args.extend(opts)
+        n_in += 1
+        return n_in - 1
+
+    # Visual segments -> scale/crop to 9:16 -> concat
+    seg_labels = []
+    if not plan:
+        i = add_input("-f", "lavfi", "-t", f"{duration:.3f}", "-i", f"color=c=0x0a0a0a:s={W}x{H}:r={FPS}")
+        filters.append(f"[{i}:v]setsar=1,format=yuv420p[s0]")
+        seg_labels.append("[s0]")
+    for k, (p, seg_dur, is_video) in enumerate(plan):
+        if is_video:
+            i = add_input("-t", f"{seg_dur:.3f}", "-i", str(p))
+        else:
+            i = add_input("-loop", "1", "-framerate", str(FPS), "-t", f"{seg_dur:.3f}", "-i", str(p))
+        filters.append(
+            f"[{i}:v]scale={W}:{H}:force_original_aspect_ratio=increase,crop={W}:{H},"
+            f"setsar=1,fps={FPS},format=yuv420p,trim=duration={seg_dur:.3f},setpts=PTS-STARTPTS[s{k}]"
+        )
+        seg_labels.append(f"[s{k}]")
+    filters.append(f"{''.join(seg_labels)}concat=n={len(seg_labels)}:v=1:a=0[b0]")
+
+    # Watermark at 70% opacity, centered, 200px from the bottom
+    i = add_input("-loop", "1", "-i", str(wm_png))
+    filters.append(f"[{i}:v]format=rgba,colorchannelmixer=aa=0.7[wm]")
+    filters.append(f"[b0][wm]overlay=x=(main_w-overlay_w)/2:y={H-200}:shortest=1[b1]")
+    last = "b1"
+
+    # Burned-in captions, each visible only inside its own window
+    for k, (png, start, end) in enumerate(caption_pngs):
+        i = add_input("-loop", "1", "-i", str(png))
+        nxt = f"c{k}"
+        filters.append(
+            f"[{last}][{i}:v]overlay=x=(main_w-overlay_w)/2:y=(main_h-overlay_h)/2:shortest=1:"
+            f"enable='between(t,{start:.3f},{end:.3f})'[{nxt}]"
+        )
+        last = nxt
+
+    # Voice, optionally mixed with quiet looping background music
+    va = add_input("-i", str(audio_path))
+    if bgm_path and Path(bgm_path).exists():
+        bi = add_input("-stream_loop", "-1", "-i", str(bgm_path))
+        filters.append(f"[{bi}:a]volume=0.12[bgm]")
+        filters.append(f"[{va}:a][bgm]amix=inputs=2:duration=first:normalize=0[aout]")
+        audio_map = "[aout]"
+    else:
+        audio_map = f"{va}:a"
+
+    args += [
+        "-filter_complex", ";".join(filters),
+        "-map", f"[{last}]", "-map", audio_map,
+        "-t", f"{duration:.3f}", "-r", str(FPS),
+        "-c:v", "libx264", "-preset", "medium", "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-threads", str(threads),
+        str(out_path),
+    ]
+    return args
+
+def compose_video_ffmpeg(audio_path: Path, img_paths: List[Path], vid_paths: List[Path], captions: List[Tuple[str,float,float]], brand_handle: str, bgm_path: Optional[Path], out_path: Path, threads: int = 4) -> Path:
+    duration = probe_duration(audio_path)
+    parts = vid_paths if vid_paths else img_paths
+    plan = plan_visuals(parts, duration)
+
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=out_path.parent, prefix=".render_") as tmp:
+        tmp = Path(tmp)
+        wm_png = tmp / "wm.png"
+        render_text_image(brand_handle).save(wm_png)
+        caption_pngs = []
+        for k, (text, start, end) in enumerate(captions):
+            if end <= start: continue
+            png = tmp / f"cap_{k}.png"
+            render_text_image(text).save(png)
+            caption_pngs.append((png, start, end))
+
+        cmd = build_command(audio_path, duration, plan, wm_png, caption_pngs, bgm_path, out_path, threads)
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed ({proc.returncode}): {proc.stderr.strip()[-2000:]}")
+    return out_path
@@ -0,0 +1,77 @@
+"""
+Cold-start cost of the CLI, checked against a budget.
+
+    python -m bench.cold_start --runs 10 --budget-ms 400
+
+We launch many short-lived cron invocations, so import time is paid on
+every poll. This measures `import app.main` in fresh interpreters (median
+wall time), lists the most expensive imports from `python -X importtime`,
+and fails (exit 1) if the median is over budget or if any heavy stack
+(render, LLM, upload SDKs) gets imported before a stage needs it.
+"""
+import argparse, json, os, statistics, subprocess, sys, time
+
+HEAVY = ("moviepy", "numpy", "PIL", "openai", "googleapiclient", "google_auth_oauthlib",
+         "playwright", "whisper", "torch", "pydub", "jinja2", "tenacity")
+
+def _python(*args, **kw):
+    return subprocess.run([sys.executable, *args], capture_output=True, text=True, **kw)
+
+def wall_times(runs: int):
+    out = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        _python("-c", "import app.main", check=True)
+        out.append(time.perf_counter() - t0)
+    baseline = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        _python("-c", "pass", check=True)
+        baseline.append(time.perf_counter() - t0)
+    return out, baseline
+
+def import_profile(top: int):
+    # -X importtime lines: "import time: self [us] | cumulative | imported package"
+    proc = _python("-X", "importtime", "-c", "import app.main", check=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cum_us, name = (p.strip() for p in line[len("import time:"):].split("|"))
+        rows.append((int(cum_us), int(self_us), name))
+    return sorted(rows, reverse=True)[:top]
+
+def loaded_heavy():
+    proc = _python("-c", "import app.main, sys, json; print(json.dumps(sorted(sys.modules)))", check=True)
+    mods = json.loads(proc.stdout)
+    return sorted({m.split(".")[0] for m in mods} & set(HEAVY))
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=10)
+    ap.add_argument("--top", type=int, default=15)
+    ap.add_argument("--budget-ms", type=float, default=float(os.getenv("COLD_START_BUDGET_MS", "400")),
+                    help="max median added by `import app.main` over a bare interpreter")
+    args = ap.parse_args()
+
+    times, baseline = wall_times(args.runs)
+    med, base = statistics.median(times) * 1000, statistics.median(baseline) * 1000
+    print(f"import app.main   p50 {med:.0f}ms  (bare interpreter {base:.0f}ms, added {med - base:.0f}ms, budget {args.budget_ms:.0f}ms)")
+    print(f"{'cumulative ms':>14}{'self ms':>9}  module")
+    for cum, self_us, name in import_profile(args.top):
+        print(f"{cum / 1000:>14.1f}{self_us / 1000:>9.1f}  {name}")
+
+    failed = False
+    heavy = loaded_heavy()
+    if heavy:
+        print(f"FAIL heavy modules imported at startup: {', '.join(heavy)}")
+        failed = True
+    if med - base > args.budget_ms:
+        print(f"FAIL cold start over budget by {med - base - args.budget_ms:.0f}ms")
+        failed = True
+    if not failed:
+        print("OK within budget")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""
+Time-to-first-piece vs. full completion for streamed script generation.
+
+    python -m bench.llm_stream --token-delay 0.02 --runs 5
+
+Starts a local OpenAI-compatible server that returns a canned script
+token by token (SSE when stream=true), then compares:
+  - blocking: use_openai (waits for the whole completion)
+  - streaming: stream_script, recording when the hook and first body
+    sentence become available to TTS
+"""
+import argparse, asyncio, json, os, statistics, tempfile, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SCRIPT = {
+    "title": "This AI Tool Writes Your Emails (not clickbait)",
+    "hook": "Stop writing emails by hand!",
+    "body": "Open the tool and paste your notes. Pick a tone in one click. "
+            "It drafts the whole reply in seconds. Edit one line and hit send.",
+    "cta": "Follow for more AI shortcuts.",
+}
+
+def _tokens(text: str):
+    # Roughly 4 chars per token, like real models
+    return [text[i:i + 4] for i in range(0, len(text), 4)]
+
+def make_handler(token_delay: float):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            req = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            content = json.dumps(SCRIPT)
+            if not req.get("stream"):
+                time.sleep(token_delay * len(_tokens(content)))
+                body = json.dumps({
+                    "id": "cmpl-bench", "object": "chat.completion", "created": int(time.time()), "model": req.get("model"),
+                    "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for tok in _tokens(content):
+                time.sleep(token_delay)
+                chunk = {
+                    "id": "cmpl-bench", "object": "chat.completion.chunk", "created": int(time.time()), "model": req.get("model"),
+                    "choices": [{"index": 0, "delta": {"content": tok}, "finish_reason": None}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+    return Handler
+
+async def bench(runs: int):
+    from app import llm
+    blocking, first_hook, first_body, full = [], [], [], []
+    for r in range(runs):
+        ctx = f"Title: bench run {r}\nBody: -"  # distinct context -> no script cache hits
+        t0 = time.perf_counter()
+        await llm.use_openai(ctx + " blocking")
+        blocking.append(time.perf_counter() - t0)
+
+        marks = {}
+        t0 = time.perf_counter()
+        def on_piece(key, text):
+            marks.setdefault(key, time.perf_counter() - t0)
+        await llm.stream_script(ctx + " streaming", on_piece)
+        full.append(time.perf_counter() - t0)
+        first_hook.append(marks.get("hook", float("nan")))
+        first_body.append(marks.get("body", float("nan")))
+
+    med = statistics.median
+    print(f"blocking completion      p50 {med(blocking):.3f}s")
+    print(f"streaming: hook ready    p50 {med(first_hook):.3f}s")
+    print(f"streaming: 1st sentence  p50 {med(first_body):.3f}s")
+    print(f"streaming: full script   p50 {med(full):.3f}s")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--token-delay", type=float, default=0.02, help="seconds between streamed tokens")
+    args = ap.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.token_delay))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["SCRIPT_CACHE_DIR"] = tmp
+        asyncio.run(bench(args.runs))
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+"""
+End-to-end pipeline throughput with every external service faked locally.
+
+    python -m bench.pipeline --articles 12 --engine ffmpeg
+    python -m bench.pipeline --articles 12 --compare bench/results/<earlier>.json
+
+One local HTTP server stands in for NewsAPI, OpenAI, ElevenLabs and
+Pixabay (plus the media CDN), serving deterministic fixtures: seeded
+headlines, a script per headline, a short MP3, and test-pattern images and
+clips made with ffmpeg. Uploads are disabled. The run polls with poll_once
+until it has --articles new stories, then pushes them through
+handle_articles (LLM -> TTS -> media -> captions -> render).
+
+Reported: articles/min, p50/p95 per stage (from the metrics trace log),
+peak RSS of this process and of the largest render worker, and CPU
+utilization. Results are written to bench/results/ as JSON, named by time
+and git revision, so two revisions can be compared with --compare.
+"""
+import argparse, asyncio, datetime, hashlib, json, os, random, re, resource, subprocess, sys, tempfile, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+FFMPEG = os.getenv("FFMPEG_BINARY", "ffmpeg")
+RESULTS_DIR = Path(__file__).parent / "results"
+
+WORDS = ("quantum startup chip robot battery merger layoffs rocket vaccine browser privacy crypto bank tariff "
+         "drone satellite search engine solar reactor lawsuit union cloud model agent glasses headset phone "
+         "camera network outage patent funding valuation acquisition regulator antitrust chatbot keyboard "
+         "laptop server datacenter fiber cable storm wildfire election budget pension mortgage housing "
+         "airline railway shipping port container factory steel copper lithium nickel oil gas wind hydrogen").split()
+
+def _ffmpeg(*args):
+    subprocess.run([FFMPEG, "-y", "-hide_banner", "-loglevel", "error", *args], check=True)
+
+def make_fixtures(root: Path, tts_seconds: float) -> dict:
+    voice, img, clip = root / "voice.mp3", root / "img.png", root / "clip.mp4"
+    _ffmpeg("-f", "lavfi", "-i", f"sine=frequency=220:duration={tts_seconds}", "-b:a", "64k", voice)
+    _ffmpeg("-f", "lavfi", "-i", "testsrc=size=1280x720", "-frames:v", "1", img)
+    _ffmpeg("-f", "lavfi", "-i", "testsrc2=size=1280x720:rate=30:duration=4", "-pix_fmt", "yuv420p", clip)
+    return {"voice": voice.read_bytes(), "img": img.read_bytes(), "clip": clip.read_bytes()}
+
+class Fakes:
+    """Deterministic state behind the fake APIs (seeded, monotonic article ids)."""
+
+    def __init__(self, fixtures: dict, seed: int, delays: dict):
+        self.fixtures = fixtures
+        self.delays = delays
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.n = 0
+        self.base = ""
+
+    def articles(self, count: int) -> list:
+        out = []
+        with self.lock:
+            for _ in range(count):
+                self.n += 1
+                title = " ".join(self.rng.sample(WORDS, 7)).capitalize()
+                ts = (datetime.datetime(2024, 1, 1) + datetime.timedelta(minutes=self.n)).isoformat() + "Z"
+                out.append({"title": f"{title} #{self.n}", "url": f"{self.base}/articles/{self.n}",
+                            "description": f"{title}. Details on story {self.n}.", "publishedAt": ts})
+        return out
+
+    @staticmethod
+    def script_for(prompt: str) -> dict:
+        m = re.search(r"Title: (.*)", prompt)
+        topic = (m.group(1) if m else "this tool").strip()
+        return {
+            "title": f"{topic[:60]} (not clickbait)",
+            "hook": "Stop scrolling, this changes everything!",
+            "body": f"Here is what happened with {topic}. It took everyone by surprise. "
+                    f"Experts say it matters for you. Here is the one thing to do next.",
+            "cta": "Follow for more.",
+        }
+
+def make_handler(fakes: Fakes):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, body: bytes, ctype: str, status: int = 200):
+            self.send_response(status)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _json(self, obj):
+            self._send(json.dumps(obj).encode(), "application/json")
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            q = parse_qs(url.query)
+            if url.path.startswith("/newsapi/"):
+                time.sleep(fakes.delays["api"])
+                n = int(q.get("pageSize", ["5"])[0])
+                arts = fakes.articles(min(n, 5))
+                return self._json({"status": "ok", "totalResults": len(arts), "articles": arts})
+            if url.path.startswith("/pixabay/"):
+                time.sleep(fakes.delays["api"])
+                tag = hashlib.sha1(q.get("q", [""])[0].encode()).hexdigest()[:12]
+                per = int(q.get("per_page", ["5"])[0])
+                if url.path.rstrip("/").endswith("videos"):
+                    hits = [{"videos": {"medium": {"url": f"{fakes.base}/media/{tag}/{i}.mp4"}}} for i in range(min(per, 2))]
+                else:
+                    hits = [{"largeImageURL": f"{fakes.base}/media/{tag}/{i}.png"} for i in range(min(per, 3))]
+                return self._json({"total": len(hits), "hits": hits})
+            if url.path.startswith("/media/"):
+                if url.path.endswith(".mp4"):
+                    return self._send(fakes.fixtures["clip"], "video/mp4")
+                return self._send(fakes.fixtures["img"], "image/png")
+            self._send(b"not found", "text/plain", 404)
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            req = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if url.path.startswith("/elevenlabs/"):
+                time.sleep(fakes.delays["tts"])
+                return self._send(fakes.fixtures["voice"], "audio/mpeg")
+            if url.path.endswith("/chat/completions"):
+                prompt = req.get("messages", [{}])[-1].get("content", "")
+                topics = re.findall(r"^Topic \d+:\n(.*)", prompt, re.M)
+                if topics:
+                    content = json.dumps({"scripts": [Fakes.script_for(t) for t in topics]})
+                else:
+                    content = json.dumps(Fakes.script_for(prompt))
+                time.sleep(fakes.delays["llm"])
+                if not req.get("stream"):
+                    return self._json({
+                        "id": "cmpl-bench", "object": "chat.completion", "created": int(time.time()), "model": req.get("model"),
+                        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+                    })
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                for i in range(0, len(content), 16):
+                    chunk = {"id": "cmpl-bench", "object": "chat.completion.chunk", "created": int(time.time()), "model": req.get("model"),
+                             "choices": [{"index": 0, "delta": {"content": content[i:i + 16]}, "finish_reason": None}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+                return
+            self._send(b"not found", "text/plain", 404)
+    return Handler
+
+def _pct(values, p):
+    values = sorted(values)
+    if not values:
+        return float("nan")
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+def _git_rev() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+async def run(n_articles: int, work: Path) -> dict:
+    from app import db, metrics
+    from app import main as app_main
+    from app.scheduler import build_sources, poll_once
+
+    db.DB_PATH = work / "bench.sqlite"
+    db.init_db()
+    cfg = work / "feeds.yaml"
+    cfg.write_text("poll_interval_seconds: 60\nfeeds:\n  - type: newsapi\n    name: newsapi\n", encoding="utf-8")
+    sources, _ = build_sources(cfg)
+
+    t0 = time.perf_counter()
+    articles, polls = [], 0
+    while len(articles) < n_articles and polls < 100:
+        articles.extend(await poll_once(sources))
+        polls += 1
+    articles = articles[:n_articles]
+    t_polled = time.perf_counter()
+    done = await app_main.handle_articles(articles, limit=len(articles))
+    wall = time.perf_counter() - t0
+    if app_main._render_farm is not None:
+        app_main._render_farm.shutdown()  # children must exit before RUSAGE_CHILDREN sees them
+    from app.downloads import get_download_manager
+    await get_download_manager().aclose()
+    await app_main.close_http_client()
+    metrics.shutdown()
+    return {"articles": len(articles), "videos": len(done), "polls": polls,
+            "poll_s": t_polled - t0, "wall_s": wall}
+
+def summarize(run_info: dict, trace_file: Path, cpu0, cpu1, args) -> dict:
+    spans = {}
+    for line in trace_file.read_text(encoding="utf-8").splitlines():
+        rec = json.loads(line)
+        spans.setdefault(rec["name"], []).append(rec["duration_s"])
+    self_ru, child_ru = cpu1
+    cpu_s = (self_ru.ru_utime + self_ru.ru_stime + child_ru.ru_utime + child_ru.ru_stime) - cpu0
+    wall = run_info["wall_s"]
+    return {
+        "revision": _git_rev(),
+        "timestamp": datetime.datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "config": {k: v for k, v in vars(args).items() if k != "compare"},
+        **run_info,
+        "articles_per_min": 60 * run_info["videos"] / wall if wall else 0.0,
+        "stages": {name: {"n": len(d), "p50_s": _pct(d, 50), "p95_s": _pct(d, 95)} for name, d in sorted(spans.items())},
+        "peak_rss_mb": self_ru.ru_maxrss / 1024,  # Linux reports KiB
+        "peak_child_rss_mb": child_ru.ru_maxrss / 1024,
+        "cpu_s": cpu_s,
+        "cpu_util_pct": 100 * cpu_s / (wall * (os.cpu_count() or 1)) if wall else 0.0,
+    }
+
+def report(res: dict, base: dict = None):
+    def delta(cur, old):
+        if not old:
+            return ""
+        return f"  ({100 * (cur - old) / old:+.1f}% vs {base['revision']})"
+    b = base or {}
+    print(f"revision {res['revision']}  {res['videos']}/{res['articles']} videos in {res['wall_s']:.1f}s "
+          f"({res['polls']} polls, {res['poll_s']:.2f}s)")
+    print(f"throughput      {res['articles_per_min']:8.2f} articles/min{delta(res['articles_per_min'], b.get('articles_per_min'))}")
+    print(f"peak RSS        {res['peak_rss_mb']:8.1f} MB (main)  {res['peak_child_rss_mb']:.1f} MB (largest child)")
+    print(f"CPU             {res['cpu_s']:8.1f} s  = {res['cpu_util_pct']:.0f}% of {os.cpu_count()} cores")
+    print(f"{'span':<22}{'n':>5}{'p50 s':>10}{'p95 s':>10}")
+    for name, st in res["stages"].items():
+        old = b.get("stages", {}).get(name, {})
+        print(f"{name:<22}{st['n']:>5}{st['p50_s']:>10.3f}{st['p95_s']:>10.3f}{delta(st['p50_s'], old.get('p50_s'))}")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--articles", type=int, default=12)
+    ap.add_argument("--engine", default=os.getenv("RENDER_ENGINE", "ffmpeg"), choices=["ffmpeg", "moviepy"])
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--tts-seconds", type=float, default=2.0, help="length of each fake TTS clip")
+    ap.add_argument("--llm-delay", type=float, default=0.5)
+    ap.add_argument("--tts-delay", type=float, default=0.3)
+    ap.add_argument("--api-delay", type=float, default=0.05, help="NewsAPI/Pixabay response delay")
+    ap.add_argument("--compare", type=Path, help="earlier results JSON to diff against")
+    ap.add_argument("--no-save", action="store_true")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        work = Path(tmp)
+        fakes = Fakes(make_fixtures(work, args.tts_seconds), args.seed,
+                      {"llm": args.llm_delay, "tts": args.tts_delay, "api": args.api_delay})
+        server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(fakes))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        fakes.base = base = f"http://127.0.0.1:{server.server_address[1]}"
+
+        # Everything is read from env at import time, so set it before importing app
+        trace_file = work / "traces.jsonl"
+        os.environ.update({
+            "NEWSAPI_KEY": "bench", "NEWSAPI_BASE_URL": f"{base}/newsapi/v2",
+            "OPENAI_API_KEY": "bench", "OPENAI_BASE_URL": f"{base}/openai/v1",
+            "ELEVENLABS_API_KEY": "bench", "ELEVENLABS_BASE_URL": f"{base}/elevenlabs/v1",
+            "PIXABAY_API_KEY": "bench", "PIXABAY_BASE_URL": f"{base}/pixabay/api",
+            "OUTPUT_DIR": str(work / "output"), "SCRIPT_CACHE_DIR": str(work / "scripts"),
+            "METRICS_TRACE_FILE": str(trace_file), "RENDER_ENGINE": args.engine,
+            "UPLOAD_YOUTUBE": "0", "UPLOAD_TIKTOK": "0",
+            "TTS_CHUNKED": os.getenv("TTS_CHUNKED", "1"),  # exact caption timing, no Whisper model needed
+        })
+        (work / "output").mkdir()
+
+        ru = lambda: (resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN))
+        s0, c0 = ru()
+        cpu0 = s0.ru_utime + s0.ru_stime + c0.ru_utime + c0.ru_stime
+        info = asyncio.run(run(args.articles, work))
+        res = summarize(info, trace_file, cpu0, ru(), args)
+        server.shutdown()
+
+    base_res = json.loads(args.compare.read_text()) if args.compare else None
+    report(res, base_res)
+    if not args.no_save:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        out = RESULTS_DIR / f"pipeline-{res['timestamp'].replace(':', '')}-{res['revision']}.json"
+        out.write_text(json.dumps(res, indent=2), encoding="utf-8")
+        print(f"saved {out}")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""
+Concurrent TikTok uploads through the warm context pool, against a local
+stand-in upload page (no TikTok account needed).
+
+    python -m bench.tiktok_upload --uploads 6 --accounts 3 --process-delay 1.5
+
+The stand-in page mimics the parts the uploader relies on: a file input, a
+caption textarea, a post button that is disabled until "processing" is
+done, and a success message some time after posting. We report wall time,
+per-upload latency and how many times each session file was rewritten.
+"""
+import argparse, asyncio, os, statistics, tempfile, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+PAGE = """<!doctype html><html><body>
+<input type="file" id="f">
+<textarea></textarea>
+<button data-e2e="post-button" disabled>Post</button>
+<div id="status"></div>
+<script>
+const btn = document.querySelector('[data-e2e="post-button"]');
+document.getElementById('f').addEventListener('change', () => {
+  setTimeout(() => { btn.disabled = false; }, %(process_ms)d);
+});
+btn.addEventListener('click', () => {
+  btn.disabled = true;
+  setTimeout(() => { document.getElementById('status').textContent = 'Your video has been uploaded'; }, %(post_ms)d);
+});
+</script></body></html>"""
+
+def make_handler(process_delay: float, post_delay: float):
+    body = (PAGE % {"process_ms": int(process_delay * 1000), "post_ms": int(post_delay * 1000)}).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            if "session=" not in (self.headers.get("Cookie") or ""):
+                self.send_header("Set-Cookie", "session=bench; Path=/; Max-Age=86400")
+            self.end_headers()
+            self.wfile.write(body)
+    return Handler
+
+async def bench(uploads: int, states, video: Path):
+    from app.upload.tiktok import TikTokUploader
+    uploader = TikTokUploader(state_paths=[str(p) for p in states], headless=True)
+    t0 = time.perf_counter()
+    await uploader.start()
+    warm = time.perf_counter() - t0
+
+    latencies = []
+    async def one(i):
+        t = time.perf_counter()
+        await uploader.upload(str(video), f"bench upload {i} #shorts")
+        latencies.append(time.perf_counter() - t)
+
+    mtimes = {p: [] for p in states}
+    t0 = time.perf_counter()
+    for batch in range(0, uploads, len(states)):
+        await asyncio.gather(*[one(i) for i in range(batch, min(uploads, batch + len(states)))])
+        for p in states:
+            if p.exists():
+                mtimes[p].append(p.stat().st_mtime_ns)
+    wall = time.perf_counter() - t0
+    await uploader.close()
+
+    print(f"pool start (browser + {len(states)} contexts)  {warm:.2f}s")
+    print(f"{uploads} uploads wall time                 {wall:.2f}s")
+    print(f"per-upload latency  p50 {statistics.median(latencies):.2f}s  max {max(latencies):.2f}s")
+    for p, ts in mtimes.items():
+        print(f"session {p.name}: rewritten {len(set(ts))}x over {len(ts)} batches")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--uploads", type=int, default=6)
+    ap.add_argument("--accounts", type=int, default=3)
+    ap.add_argument("--process-delay", type=float, default=1.5, help="seconds until the post button enables")
+    ap.add_argument("--post-delay", type=float, default=0.5, help="seconds until the success message")
+    args = ap.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.process_delay, args.post_delay))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["TIKTOK_UPLOAD_URL"] = f"http://127.0.0.1:{server.server_address[1]}/upload"
+    import app.upload.tiktok as tiktok
+    tiktok.UPLOAD_URL = os.environ["TIKTOK_UPLOAD_URL"]  # module read it at import
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        video = root / "clip.mp4"
+        video.write_bytes(b"\0" * 1024)
+        states = [root / f"account{i}.json" for i in range(args.accounts)]
+        asyncio.run(bench(args.uploads, states, video))
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()